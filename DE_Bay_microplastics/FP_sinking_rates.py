@@ -1,11 +1,16 @@
 #!/usr/bin/env python
 """
 Created on Mar 24 2020 by Lori Garzio
-@brief Creates box plots of zooplankton fecal pellet sinking rates. The box limits extend from the lower to upper
-quartiles, with a line at the median and a diamond symbol at the mean. Whiskers extend from the box to show the range
-of the data.
+@brief Creates box plots of zooplankton fecal pellet sinking rates for each cruise. The box limits extend from the lower
+to upper quartiles, with a line at the median and a diamond symbol at the mean. Whiskers extend from the box to show
+the range of the data.
 expt: experiment to analyze (options: expt1, expt2)
-f: file containing experimental data; fecal pellet sinking rates
+f: file containing experimental data; fecal pellet sinking rates (column sinking_rate_m_day) or raw settling-column
+timings (columns pellet_id, distance_cm, time_sec)
+n_jobs: number of worker processes used to process cruises in parallel
+outdir: optional output directory, default is the figures subdirectory of the directory containing f
+history: optional time series history directory, the sinking rates for each cruise are added to the history
+(see functions/timeseries.py)
 """
 
 import numpy as np
@@ -13,45 +18,28 @@ import pandas as pd
 import os
 import matplotlib.pyplot as plt
 from matplotlib.offsetbox import AnchoredText
-from scipy import stats
+from functions.common import cruise_label, treatment_label
+from functions.figure_writer import save_figure
+from functions.parallel import map_partitions
+from functions.sinking import calculate_sinking_rates, summarize_sinking_rates, compare_treatments
+from functions.timeseries import append_history, sufficient_stats
+from functions.validation import check, validate_sinking
 pd.set_option('display.width', 320, "display.max_columns", 10)  # for display in pycharm console
 
-expt = 'expt2'  # expt1 or expt2
-f = ''.join(('/Users/lgarzio/Documents/rucool/Saba/microplastics/NOAA2018/data/DEBay_MP_', expt, '.xlsx'))
 
-df = pd.read_excel(f, sheet_name='FP')
-
-cruises = np.unique(df['cruise']).tolist()
-bplot = []
-labs = []
-for cruise in cruises:
-    dfc = df.loc[df['cruise'] == cruise]
+def plot_sinking_rates(cruise, dfc, expt, figdir):
     stations = np.unique(dfc['station']).tolist()
-    for sta in stations:
-        if sta == 'inside_front':
-            labs.append('Inside Front')
-        elif sta == 'outside_front':
-            labs.append('Outside Front')
-        elif sta == 'algae':
-            labs.append('Algal Culture')
-        elif sta == 'algae_plastic':
-            labs.append('Algal Culture + Plastic')
-        else:
-            labs.append(sta)
-        dfi = dfc.loc[df['station'] == sta]
-        sinking_rates = dfi['sinking_rate_m_day'].tolist()
-        bplot.append(sinking_rates)
-        mn = round(np.nanmean(sinking_rates), 2)
-        stdev = round(np.nanstd(sinking_rates, ddof=1), 2)
-        n = len(sinking_rates)
-        print('-------------')
-        print('Treatment: {}'.format(sta))
-        print('Sinking rates (m/day)\n Avg = {} \n SD = {} \n n = {}'.format(mn, stdev, n))
+    bplot = [dfc.loc[dfc['station'] == sta, 'sinking_rate_m_day'].tolist() for sta in stations]
+    labs = [treatment_label(sta) for sta in stations]
+
     fig, ax = plt.subplots()
     if expt == 'expt1':
-        colors = ['darkgray', 'steelblue']
+        colors, cmap = ['darkgray', 'steelblue'], 'Blues'
     else:
-        colors = ['darkgray', 'seagreen']
+        colors, cmap = ['darkgray', 'seagreen'], 'Greens'
+    if len(stations) > len(colors):
+        # more than one treatment besides the first: shades of the experiment color
+        colors = colors[:1] + list(plt.get_cmap(cmap)(np.linspace(0.4, 0.9, len(stations) - 1)))
 
     # customize the boxplot elements
     medianprops = dict(color='black')
@@ -65,14 +53,57 @@ for cruise in cruises:
         patch.set_facecolor(color)
     ax.set_xlabel('Treatment')
     ax.set_ylabel(r'FP sinking rate (m $\rm day^{-1}$)')  # \rm removes the italics
-    plt.title('Fall 2019')
+    plt.title(cruise_label(cruise))
+
+    # Student's t-test for two treatments, one-way ANOVA for more than two
+    result = compare_treatments(dfc, 'station')
+    if result is not None:
+        if result['test'] == 't-test':
+            stat_lab = 't'
+        else:
+            stat_lab = 'F'
+            result['tukey'] = str(result['tukey'])
+        atext = AnchoredText('{} = {}\np = {}'.format(stat_lab, abs(round(result['statistic'], 2)),
+                                                     '{:.7f}'.format(result['pvalue'])),
+                             loc=1, frameon=False, pad=1.5)
+        ax.add_artist(atext)
+
+    plt_fname = 'FP_sinking_rates_{}_{}.png'.format(expt, cruise)  # one figure per cruise
+    plt_save = os.path.join(figdir, plt_fname)
+    save_figure(fig, plt_save)
+
+    return result
+
+
+def main(f, expt, n_jobs=1, outdir=None, history=None):
+    figdir = outdir or os.path.join(os.path.dirname(f), 'figures')
+
+    df = pd.read_excel(f, sheet_name='FP')
+    check(validate_sinking(df), f)  # stops with a report of all errors
+    if 'sinking_rate_m_day' not in df.columns:
+        df = calculate_sinking_rates(df)
+
+    summary = summarize_sinking_rates(df)
+    for i, row in summary.iterrows():
+        print('-------------')
+        print('Cruise: {}, Treatment: {}'.format(row['cruise'], row['station']))
+        print('Sinking rates (m/day)\n Avg = {} \n SD = {} \n n = {}'.format(round(row['avg'], 2),
+                                                                          round(row['stdev'], 2), row['n']))
+
+    # plot each cruise, in parallel if n_jobs > 1
+    results = map_partitions(plot_sinking_rates, dict(dfc=df), n_jobs=n_jobs, expt=expt, figdir=figdir)
+    for cruise, result in results:
+        if result is not None and result['tukey'] is not None:
+            print('\nTukey HSD pairwise-comparison: {}'.format(cruise))
+            print(result['tukey'])
+
+    if history:
+        source = os.path.splitext(os.path.basename(f))[0]
+        append_history(history, sufficient_stats(df, 'sinking_rate_m_day', 'sinking_rate_m_day', source,
+                                                 station_col='station'))
 
-    # calculate Student's t-test
-    t2, p2 = stats.ttest_ind(bplot[0], bplot[1])
-    atext = AnchoredText('t = {}\np = {}'.format(abs(round(t2, 2)), '{:.7f}'.format(p2)), loc=1, frameon=False, pad=1.5)
-    ax.add_artist(atext)
 
-    plt_fname = ''.join(('FP_sinking_rates_', expt, '.png'))
-    plt_save = os.path.join(os.path.dirname(f), 'figures', plt_fname)
-    plt.savefig(str(plt_save), dpi=150)
-    plt.close
+if __name__ == '__main__':
+    expt = 'expt2'  # expt1 or expt2
+    fname = ''.join(('/Users/lgarzio/Documents/rucool/Saba/microplastics/NOAA2018/data/DEBay_MP_', expt, '.xlsx'))
+    main(fname, expt, n_jobs=1)
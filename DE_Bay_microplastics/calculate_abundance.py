@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+@brief Calculate zooplankton abundance (ind/m3 and ind/m2) for every tow and taxon by joining raw counts to sample
+split fractions and net tow volumes
+f: file containing raw zooplankton counts (sheet 'counts') and sample split fractions (sheet 'splits')
+tow_file: file containing net tow information, including the volume sampled (output from water_volume_sampled.py)
+outdir: optional output directory, default is the directory containing f
+keys: optional list of columns identifying a tow. Default is ['cruise', 'tow'] if the counts, splits and tows all have
+a cruise column (tow IDs are reused between cruises in multi-cruise archives), otherwise ['tow']
+"""
+
+import os
+import pandas as pd
+from functions.abundance import calculate_abundance
+pd.set_option('display.width', 320, "display.max_columns", 10)  # for display in pycharm console
+
+
+def main(f, tow_file, outdir=None, keys=None):
+    counts = pd.read_excel(f, sheet_name='counts')
+    splits = pd.read_excel(f, sheet_name='splits')
+    tows = pd.read_csv(tow_file)
+
+    if keys is None:
+        keys = ['tow']
+        if all(['cruise' in x.columns for x in [counts, splits, tows]]):
+            keys = ['cruise', 'tow']
+
+    df = calculate_abundance(counts, splits, tows, keys=keys)
+    sname = '{}_abundance_calculated.csv'.format(os.path.splitext(os.path.basename(f))[0])
+    df.to_csv(os.path.join(outdir or os.path.dirname(f), sname), index=False)
+
+
+if __name__ == '__main__':
+    fname = '/Users/lgarzio/Documents/rucool/Saba/microplastics/NOAA2018/data/DEBay_MP_zooplankton_counts.xlsx'
+    tow_fname = '/Users/lgarzio/Documents/rucool/Saba/microplastics/NOAA2018/data/DEBay_MP_fieldsampling.csv'
+    main(fname, tow_fname)
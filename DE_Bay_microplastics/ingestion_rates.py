@@ -4,6 +4,12 @@ Created on Feb 5 2020 by Lori Garzio
 @brief Calculate zooplankton ingestion rates using experimental data
 expt: experiment to analyze (options: expt1, expt2)
 f: file containing experimental data; chl-a data at initial and final time points
+n_jobs: number of worker processes used to process cruises in parallel
+out_fmt: output format for the summary tables (options: csv, parquet, xlsx)
+n_mc: number of Monte Carlo replicates used to calculate ingestion rate confidence intervals (0 to skip)
+outdir: optional output directory, default is the directory containing f (tables) and its figures subdirectory
+history: optional time series history directory, the ingestion rates for each cruise are added to the history
+(see functions/timeseries.py)
 """
 
 import numpy as np
@@ -11,175 +17,110 @@ import pandas as pd
 import os
 import matplotlib.pyplot as plt
 from matplotlib.offsetbox import AnchoredText
-from scipy import stats
+from functions.common import cruise_label, treatment_label
+from functions.figure_writer import save_figure
+from functions.grazing import calculate_ingestion_rates, ingestion_rate_uncertainty
+from functions.parallel import map_partitions
+from functions.results import typed_table, write_tables
+from functions.schema import load_sheet
+from functions.sinking import compare_treatments
+from functions.timeseries import append_history, sufficient_stats
+from functions.validation import check, validate_grazing
 pd.set_option('display.width', 320, "display.max_columns", 10)  # for display in pycharm console
 
-expt = 'expt1'  # expt1 or expt2
-f = ''.join(('/Users/lgarzio/Documents/rucool/Saba/microplastics/NOAA2018/data/DEBay_MP_', expt, '.xlsx'))
-sname = '_'.join(('DEBay_MP', expt, 'chla_ingest_rates_summary'))
-
-
-# headers for final output
-sheaders = ['cruise', 'treatment', 'full_treatment', 'chl_t0', 'chl_tf', 'time_hours',
-            'clearance_rate (mls/individual/hour)', 'ingestion_rate (ug Chl/ind/hr)', 'ingestion_rate (ug Chl/ind/day)']
-
-summary = []
-
-df = pd.read_excel(f, sheet_name='chla')
-hours_df = pd.read_excel(f, sheet_name='expt_data')
-df['btl_tp'] = df['Bottle'] + '_' + df['Time Point']
-cruises = np.unique(df['Cruise']).tolist()
-for cruise in cruises:
-    dfc = df.loc[df['Cruise'] == cruise]
-    try:
-        stations = np.unique(dfc['Station']).tolist()
-        sta_header = 'Station'
-    except KeyError:
-        stations = np.unique(dfc['Treatment']).tolist()
-        sta_header = 'Treatment'
-    if stations == ['inside_front', 'outside_front']:
-        stations = ['outside_front', 'inside_front']
-    for sta in stations:
-        dfi = dfc.loc[df[sta_header] == sta]
-
-        # calculate average chl-a for the controls at each time point
-        controls = dfi[dfi['btl_tp'].str.contains('control')]
-        timepts = np.unique(controls['Time Point']).tolist()
-        for tps in timepts:
-            if 't0' in tps or 'T0' in tps:
-                c_avg_t0 = np.average(controls[controls['Time Point'] == tps]['Chl (ug/l)'])
-            elif 'tf' in tps or 'Tf' in tps:
-                c_avg_tf = np.average(controls[controls['Time Point'] == tps]['Chl (ug/l)'])
-
-        # calculate the average experiment time for the controls
-        try:
-            c_expt_time = np.average(hours_df.loc[(hours_df['cruise'] == cruise) &
-                                                  (hours_df['station'] == sta) &
-                                                  (hours_df['bottle'].str.contains('control'))]['expt_time_hours'])
-        except KeyError:
-            c_expt_time = np.average(hours_df.loc[(hours_df['cruise'] == cruise) &
-                                                  (hours_df['treatment'] == sta) &
-                                                  (hours_df['bottle'].str.contains('control'))]['expt_time_hours'])
-
-        summary.append([cruise, sta, '_'.join((sta, 'control_avg')), c_avg_t0, c_avg_tf, c_expt_time])
-
-        # calculate k from the controls
-        k = (np.log(c_avg_tf / c_avg_t0)) / c_expt_time
-
-        # add the treatment data to the summary
-        treatments = dfi[dfi['btl_tp'].str.contains('treatment')]
-        for i, row in treatments.iterrows():
-            try:
-                hours_df['station']
-                hours_header = 'station'
-            except KeyError:
-                hours_header = 'treatment'
-
-            tmt_time_row = hours_df.loc[(hours_df['cruise'] == cruise) &
-                                        (hours_df[hours_header] == sta) &
-                                        (hours_df['bottle'] == row['Bottle'])]
-            tmt_time_array = np.array(tmt_time_row['expt_time_hours'])
-            if len(tmt_time_array) == 1:
-                tmt_time = tmt_time_array[0]
-            else:
-                raise ValueError('Check experiment times: {} {} {}'.format(cruise, sta, row['Bottle']))
-
-            neg_g_prime = np.log(row['Chl (ug/l)'] / c_avg_t0) / tmt_time
-            g = -neg_g_prime + k
-            clearance_rate = row['expt_vol_ml'] * g / row['num_copes']  # clearance rate, mls/individual/hour
-            c = ((c_avg_t0 * ((np.exp(neg_g_prime * tmt_time)) - 1)) / (neg_g_prime * tmt_time)) / 1000  # ug/ml
-            ingest_rate_hour = clearance_rate * c  # ug Chl/ind/hour
-            ingest_rate_day = ingest_rate_hour * 24  # ug Chl/ind/day
-
-            summary.append([cruise, row[sta_header], '_'.join((sta, row['Bottle'])), c_avg_t0, row['Chl (ug/l)'],
-                            tmt_time, clearance_rate, ingest_rate_hour, ingest_rate_day])
-
-
-summary_df = pd.DataFrame(summary, columns=sheaders)
-
-summary.append([])  # add extra blank row
-summary.append(['cruise', 'treatment', 'ingestion_rate_avg (ug Chl/ind/day)', 'ingestion_rate_stdev (ug Chl/ind/day)'])
-
-# calculate averages and stdev for each treatment
-plotting_df = pd.DataFrame()
-stats_dict = dict()
-for cruise in cruises:
-    plotting_dict = dict(cruise=[], labels=[], ingestion_rates=[], stdev=[])
-    sdfc = summary_df.loc[summary_df['cruise'] == cruise]
-    try:
-        stats_dict[cruise]
-    except KeyError:
-        stats_dict[cruise] = dict()
-    for sta in stations:
-        sdfi = sdfc.loc[sdfc['treatment'] == sta]
-        ir = np.array(sdfi['ingestion_rate (ug Chl/ind/day)'])
-        ir = ir[~np.isnan(ir)]
-        ir[ir < 0] = 0  # set negative ingestion rates to zero
-        stats_dict[cruise][sta] = ir
-        mn = np.nanmean(ir)
-        stdev = np.nanstd(ir, ddof=1)
-        summary.append([cruise, sta, mn, stdev])
-        plotting_dict['cruise'].append(cruise)
-        if sta == 'inside_front':
-            plotting_dict['labels'].append('Inside Front')
-        elif sta == 'outside_front':
-            plotting_dict['labels'].append('Outside Front')
-        elif sta == 'algae':
-            plotting_dict['labels'].append('Algal Culture')
-        elif sta == 'algae_plastic':
-            plotting_dict['labels'].append('Algal Culture + Plastic')
-        else:
-            plotting_dict['labels'].append(sta)
-        plotting_dict['ingestion_rates'].append(mn)
-        plotting_dict['stdev'].append(stdev)
-    df = pd.DataFrame(plotting_dict)
-    if len(plotting_df) < 1:
-        plotting_df = df
+# headers and dtypes for final output: rates for each bottle and stats for each treatment
+rates_dtypes = {'cruise': str, 'treatment': str, 'full_treatment': str, 'chl_t0': float, 'chl_tf': float,
+                'time_hours': float, 'clearance_rate (mls/individual/hour)': float,
+                'ingestion_rate (ug Chl/ind/hr)': float, 'ingestion_rate (ug Chl/ind/day)': float}
+stats_dtypes = {'cruise': str, 'treatment': str, 'ingestion_rate_avg (ug Chl/ind/day)': float,
+                'ingestion_rate_stdev (ug Chl/ind/day)': float, 'n': int}
+
+
+def plot_ingestion_rates(cruise, stats_df, ir_df, expt, figdir):
+    fig, ax = plt.subplots()
+    if expt == 'expt1':
+        c = 'steelblue'
     else:
-        plotting_df = plotting_df.append(df, ignore_index=True)
-
-fig, ax = plt.subplots()
-if expt == 'expt1':
-    c = 'steelblue'
-else:
-    c = 'seagreen'
-ax.bar(plotting_df['labels'], plotting_df['ingestion_rates'], color=c, label='Fall2019', yerr=plotting_df['stdev'], capsize=8)
-
-#### for more than 1 cruise
-# colors = ['firebrick', 'mediumseagreen', 'purple']
-# width = 0.25
-# fall = plotting_df[plotting_df['cruise'] == 'Fall2019']
-# spring = plotting_df[plotting_df['cruise'] == 'Spring2020']
-#
-# ind = np.arange(len(fall))
-#
-# rects1 = ax.bar(ind, np.array(fall['ingestion_rates']), color='firebrick', width=width, alpha=0.5,
-#                 label='Fall2019', yerr=fall['stdev'], capsize=8)
-# rects2 = ax.bar(ind + width, np.array(spring['ingestion_rates']), color='blue', width=width, alpha=0.5,
-#                 label='Spring2020', yerr=spring['stdev'], capsize=8)
-# ax.set_xticks(ind + width/2)
-# ax.set_xticklabels(fall['labels'])
-
-#ax.legend(loc='best')
-ax.set_xlabel('Treatment')
-ylab = 'Ingestion Rates ({}g Chl'.format(chr(956))
-ax.set_ylabel(' '.join((ylab, r'$\rm ind^{-1} day^{-1}$)')))  # \rm removes the italics
-plt.title('Fall 2019')
-
-# calculate Student's t-test
-try:
-    t2, p2 = stats.ttest_ind(stats_dict['Fall2019']['inside_front'], stats_dict['Fall2019']['outside_front'])
-    atext = AnchoredText('t = {}\np = {}'.format(abs(round(t2, 2)), round(p2, 3)), loc=1, frameon=False, pad=1.5)
-except KeyError:
-    t2, p2 = stats.ttest_ind(stats_dict['Fall2019']['algae'], stats_dict['Fall2019']['algae_plastic'])
-    atext = AnchoredText('t = {}\np = {}'.format(abs(round(t2, 2)), round(p2, 4)), loc=1, frameon=False, pad=1.5)
-
-ax.add_artist(atext)
-
-plt_fname = ''.join(('Chla_ingest_rates_', expt, '.png'))
-plt_save = os.path.join(os.path.dirname(f), 'figures', plt_fname)
-plt.savefig(str(plt_save), dpi=150)
-plt.close
-
-summary_df = pd.DataFrame(summary, columns=sheaders)
-summary_df.to_csv('{}/{}.csv'.format(os.path.dirname(f), sname), index=False)
+        c = 'seagreen'
+    labels = [treatment_label(sta) for sta in stats_df['treatment']]
+    ax.bar(labels, stats_df['ingestion_rate_avg (ug Chl/ind/day)'], color=c, label=cruise,
+           yerr=stats_df['ingestion_rate_stdev (ug Chl/ind/day)'], capsize=8)
+
+    ax.set_xlabel('Treatment')
+    ylab = 'Ingestion Rates ({}g Chl'.format(chr(956))
+    ax.set_ylabel(' '.join((ylab, r'$\rm ind^{-1} day^{-1}$)')))  # \rm removes the italics
+    plt.title(cruise_label(cruise))
+
+    # Student's t-test for two treatments, one-way ANOVA for more than two
+    result = compare_treatments(ir_df, 'treatment', value_col='ingestion_rate')
+    if result is not None:
+        if result['test'] == 't-test':
+            stat_lab = 't'
+        else:
+            stat_lab = 'F'
+        atext = AnchoredText('{} = {}\np = {}'.format(stat_lab, abs(round(result['statistic'], 2)),
+                                                     round(result['pvalue'], 4)), loc=1, frameon=False, pad=1.5)
+        ax.add_artist(atext)
+
+    plt_fname = 'Chla_ingest_rates_{}_{}.png'.format(expt, cruise)
+    plt_save = os.path.join(figdir, plt_fname)
+    save_figure(fig, plt_save)
+
+
+def main(f, expt, n_jobs=1, out_fmt='csv', n_mc=0, outdir=None, history=None):
+    sname = '_'.join(('DEBay_MP', expt, 'chla_ingest_rates_summary'))
+    sdir = outdir or os.path.dirname(f)
+    figdir = outdir or os.path.join(os.path.dirname(f), 'figures')
+
+    summary = []
+
+    df = load_sheet(f, 'chla')
+    hours_df = load_sheet(f, 'expt_data')
+
+    # check all bottles before calculating anything, stops with a report of all errors
+    check(validate_grazing(df, hours_df), f)
+
+    # calculate the ingestion rates for each cruise, in parallel if n_jobs > 1
+    cruise_summaries = map_partitions(calculate_ingestion_rates, dict(chla=df, expt_data=hours_df), n_jobs=n_jobs)
+    cruises = np.unique(df['cruise']).tolist()
+    for cruise, cruise_summary in cruise_summaries:
+        summary.extend(cruise_summary)
+
+    summary_df = typed_table(summary, rates_dtypes)
+
+    # confidence intervals for the ingestion rates from perturbed replicates of the inputs
+    if n_mc > 0:
+        rates_ci, stats_ci = ingestion_rate_uncertainty(df, hours_df, n_reps=n_mc)
+
+    # calculate averages and stdev for each treatment
+    ir_df = summary_df[['cruise', 'treatment']].copy()
+    ir_df['ingestion_rate'] = summary_df['ingestion_rate (ug Chl/ind/day)'].clip(lower=0)  # negative rates set to 0
+    ir_df = ir_df.dropna(subset=['ingestion_rate'])
+    stats_summary = []
+    for cruise in cruises:
+        sdfc = ir_df.loc[ir_df['cruise'] == cruise]
+        stations = pd.unique(sdfc['treatment']).tolist()
+        for sta in stations:
+            ir = np.array(sdfc.loc[sdfc['treatment'] == sta, 'ingestion_rate'])
+            stats_summary.append([cruise, sta, np.nanmean(ir), np.nanstd(ir, ddof=1), len(ir)])
+    stats_df = typed_table(stats_summary, stats_dtypes)
+
+    # write the tables before plotting, so the results are saved even if a figure fails
+    tables = dict(rates=summary_df, stats=stats_df)
+    if n_mc > 0:
+        tables['rates_ci'], tables['stats_ci'] = rates_ci, stats_ci
+    write_tables(tables, os.path.join(sdir, sname), fmt=out_fmt)
+
+    if history:
+        source = os.path.splitext(os.path.basename(f))[0]
+        append_history(history, sufficient_stats(ir_df, 'ingestion_rate_ug_chl_ind_day', 'ingestion_rate', source))
+
+    for cruise in cruises:
+        plot_ingestion_rates(cruise, stats_df.loc[stats_df['cruise'] == cruise], ir_df.loc[ir_df['cruise'] == cruise],
+                             expt, figdir)
+
+
+if __name__ == '__main__':
+    expt = 'expt1'  # expt1 or expt2
+    fname = ''.join(('/Users/lgarzio/Documents/rucool/Saba/microplastics/NOAA2018/data/DEBay_MP_', expt, '.xlsx'))
+    main(fname, expt, n_jobs=1, out_fmt='csv', n_mc=0)
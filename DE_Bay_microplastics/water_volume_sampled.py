@@ -5,20 +5,25 @@ Created on Jan 30 2020 by Lori Garzio
 rotor_constant: rotor constant specific to the flowmeter
 r: radius of net opening in meters
 csv_file: file containing flowmeter readings
+outdir: optional output directory, default is to overwrite csv_file
 """
 
 import pandas as pd
+import os
+from functions.abundance import calculate_volume_sampled
 pd.set_option('display.width', 320, "display.max_columns", 10)  # for display in pycharm console
 
-rotor_constant = 26873  # rotor constant specific to the flowmeter
-r = 0.25  # radius of net opening in meters (half meter ring net)
-csv_file = '/Users/lgarzio/Documents/rucool/Saba/microplastics/NOAA2018/data/DEBay_MP_fieldsampling.csv'
 
+def main(csv_file, rotor_constant, r, outdir=None):
+    df = pd.read_csv(csv_file)
+    df = calculate_volume_sampled(df, rotor_constant, r)
+    if outdir:
+        csv_file = os.path.join(outdir, os.path.basename(csv_file))
+    df.to_csv(csv_file, index=False)
 
-df = pd.read_csv(csv_file)
 
-df['flowmeter_diff'] = df['flowmeter_end'] - df['flowmeter_start']
-
-# (distance m) * (area of net opening m3)
-df['vol_sampled_m3'] = (df['flowmeter_diff'] * rotor_constant / 999999) * (3.14 * r * r)
-df.to_csv(csv_file, index=False)
+if __name__ == '__main__':
+    rotor_const = 26873  # rotor constant specific to the flowmeter
+    radius = 0.25  # radius of net opening in meters (half meter ring net)
+    fname = '/Users/lgarzio/Documents/rucool/Saba/microplastics/NOAA2018/data/DEBay_MP_fieldsampling.csv'
+    main(fname, rotor_const, radius)
@@ -3,6 +3,9 @@
 Created on Apr 9 2020 by Lori Garzio
 @brief Creates bar charts of zooplankton abundance
 f: file containing zooplankton abundance data
+outdir: optional output directory for the figures, default is the directory containing f
+report: optional report format (pdf, or png for a tiled image) to compose all figures into one file
+ncols, nrows: optional report layout, panels per row and rows per page (tiled pdf pages are raster images)
 """
 
 import numpy as np
@@ -10,13 +13,13 @@ import pandas as pd
 import os
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
-from brokenaxes import brokenaxes
+from functions.figure_writer import figure_writer, save_figure
+from functions.sparse import SparseAbundance
 pd.set_option('display.width', 320, "display.max_columns", 10)  # for display in pycharm console
 
-f = '/Users/lgarzio/Documents/rucool/Saba/microplastics/RaritanBay/RaritanBay.xlsx'
 
-
-def stacked_bar_chart(dataframe, group_list, column_name, bar_width, plot_title, sname, colors=None):
+def stacked_bar_chart(dataframe, group_list, column_name, bar_width, plot_title, sname, figdir, colors=None,
+                      writer=None):
     fig, ax = plt.subplots()
     for ind in range(len(group_list)):
         sdf = dataframe[dataframe[column_name] == group_list[ind]]
@@ -43,42 +46,56 @@ def stacked_bar_chart(dataframe, group_list, column_name, bar_width, plot_title,
     plt.title(plot_title)
     plt.legend(fontsize=8)
 
-    plt_save = os.path.join(os.path.dirname(f), sname)
-    plt.savefig(str(plt_save), dpi=150)
-    plt.close
-
-
-df = pd.read_excel(f, sheet_name='abundance')
-df.sort_values(by='CS', inplace=True)  # make sure the stations are in alphabetical order
-df['species_display'] = ''
-
-for i, row in df.iterrows():
-    # shorten copepod species names
-    if 'Copepod' in row['type']:
-        df.loc[i, 'species_display'] = '. '.join((row['species'].split(' ')[0][0], row['species'].split(' ')[1]))
-    else:
-        df.loc[i, 'species_display'] = row['species']
-
-stns = np.unique(df['CS']).tolist()
-
-# bar chart with location on x-axis, inside and outside front only
-width = 0.4
-
-# bar chart with station on x-axis
-df_copes = df[df['type'] != 'Other']
-species = np.unique(df_copes['species_display']).tolist()
-cols = cm.tab20(np.linspace(0, 1, len(species)))
-plt_ttl = 'Spring 2019 Copepods'
-stacked_bar_chart(df_copes, species, 'species_display', width, plt_ttl, 'zooplankton_abundance1.png', cols)
-
-# bar chart with location on x-axis, copepod groups
-df_copes = df[df['type'] != 'Other']
-df_copes_type = df_copes.groupby(['CS', 'type']).sum().reset_index()
-types = np.unique(df_copes['type']).tolist()
-stacked_bar_chart(df_copes_type, types, 'type', width, plt_ttl, 'zooplankton_abundance2.png')
-
-# bar chart with location on x-axis, A. tonsa only
-df_atonsa = df[df['species_display'] == 'A. tonsa']
-species = np.unique(df_atonsa['species_display']).tolist()
-plt_ttl = 'Fall 2019 - Acartia tonsa'
-stacked_bar_chart(df_atonsa, species, 'species_display', width, plt_ttl, 'zooplankton_abundance_atonsa.png')
\ No newline at end of file
+    plt_save = os.path.join(figdir, sname)
+    save_figure(fig, plt_save, writer)
+
+
+def main(f, outdir=None, report=None, ncols=None, nrows=None):
+    figdir = outdir or os.path.dirname(f)
+    report_fname = os.path.join(figdir, '{}_report'.format(os.path.splitext(os.path.basename(f))[0]))
+    writer = figure_writer(report, report_fname, ncols, nrows)  # write figures in the background
+
+    df = pd.read_excel(f, sheet_name='abundance')
+    df.sort_values(by='CS', inplace=True)  # make sure the stations are in alphabetical order
+    df['species_display'] = ''
+
+    for i, row in df.iterrows():
+        # shorten copepod species names
+        if 'Copepod' in row['type']:
+            df.loc[i, 'species_display'] = '. '.join((row['species'].split(' ')[0][0], row['species'].split(' ')[1]))
+        else:
+            df.loc[i, 'species_display'] = row['species']
+
+    stns = np.unique(df['CS']).tolist()
+
+    # bar chart with location on x-axis, inside and outside front only
+    width = 0.4
+
+    # bar chart with station on x-axis
+    df_copes = df[df['type'] != 'Other']
+    species = np.unique(df_copes['species_display']).tolist()
+    cols = cm.tab20(np.linspace(0, 1, len(species)))
+    plt_ttl = 'Spring 2019 Copepods'
+    stacked_bar_chart(df_copes, species, 'species_display', width, plt_ttl, 'zooplankton_abundance1.png', figdir, cols,
+                      writer=writer)
+
+    # bar chart with location on x-axis, copepod groups
+    df_copes = df[df['type'] != 'Other']
+    abundance = SparseAbundance.from_long(df_copes, 'CS', 'species', group_col='type')
+    df_copes_type = abundance.rollup().to_long(row_name='CS', taxon_name='type')
+    types = np.unique(df_copes['type']).tolist()
+    stacked_bar_chart(df_copes_type, types, 'type', width, plt_ttl, 'zooplankton_abundance2.png', figdir, writer=writer)
+
+    # bar chart with location on x-axis, A. tonsa only
+    df_atonsa = df[df['species_display'] == 'A. tonsa']
+    species = np.unique(df_atonsa['species_display']).tolist()
+    plt_ttl = 'Fall 2019 - Acartia tonsa'
+    stacked_bar_chart(df_atonsa, species, 'species_display', width, plt_ttl, 'zooplankton_abundance_atonsa.png', figdir,
+                      writer=writer)
+
+    writer.close()
+
+
+if __name__ == '__main__':
+    fname = '/Users/lgarzio/Documents/rucool/Saba/microplastics/RaritanBay/RaritanBay.xlsx'
+    main(fname)
@@ -3,6 +3,10 @@
 Created on May 14 2020 by Lori Garzio
 @brief Calculate stats for krill lengths from grazing experiments
 f: file containing experimental data
+outdir: optional output directory for the figures, default is figs/krill_length in the parent of the directory
+containing f
+report: optional report format (pdf, or png for a tiled image) to compose all figures into one file
+ncols, nrows: optional report layout, panels per row and rows per page (tiled pdf pages are raster images)
 """
 
 import pandas as pd
@@ -14,6 +18,7 @@ from statsmodels.stats.multicomp import pairwise_tukeyhsd
 import statsmodels.api as sm
 from statsmodels.formula.api import ols
 import itertools
+from functions.figure_writer import figure_writer, save_figure
 pd.set_option('display.width', 320, "display.max_columns", 10)  # for display in pycharm console
 
 
@@ -24,9 +29,12 @@ def rank_transformation(data):
     return d_trans
 
 
-def main(f):
+def main(f, outdir=None, report=None, ncols=None, nrows=None):
     df = pd.read_excel(f, sheet_name='krill_length')
     spath = os.path.split(os.path.dirname(f))[0]
+    figdir = outdir or os.path.join(spath, 'figs', 'krill_length')
+    report_fname = os.path.join(figdir, '{}_report'.format(os.path.splitext(os.path.basename(f))[0]))
+    writer = figure_writer(report, report_fname, ncols, nrows)  # write figures in the background
 
     # check normality
     data = []
@@ -55,9 +63,8 @@ def main(f):
         plt.tight_layout()
 
         plt_fname = 'hist_krill_length_{}_ranktransformed.png'.format(col)
-        plt_save = os.path.join(spath, 'figs', 'krill_length', plt_fname)
-        plt.savefig(str(plt_save), dpi=150)
-        plt.close
+        plt_save = os.path.join(figdir, plt_fname)
+        save_figure(fig, plt_save, writer)
 
     # plot all data
     data2 = list(itertools.chain(*data))
@@ -73,9 +80,9 @@ def main(f):
     plt.tight_layout()
 
     plt_fname = 'hist_krill_length_ranktransformed.png'
-    plt_save = os.path.join(spath, 'figs', 'krill_length', plt_fname)
-    plt.savefig(str(plt_save), dpi=150)
-    plt.close
+    plt_save = os.path.join(figdir, plt_fname)
+    save_figure(fig, plt_save, writer)
+    writer.close()
 
     # pivot the dataframe to do the rank transformation
     dft = pd.melt(df.reset_index(), id_vars=['index'], value_vars=df.columns.tolist())
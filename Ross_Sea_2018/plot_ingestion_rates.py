@@ -5,6 +5,10 @@ Created on May 11 2020 by Lori Garzio
 quartiles, with a line at the median and a diamond symbol at the mean. Whiskers extend from the box to show the range
 of the data.
 f: file containing experimental data
+n_jobs: number of worker processes used to process experiments in parallel
+outdir: optional output directory for the figures, default is figs in the parent of the directory containing f
+report: optional report format (pdf, or png for a tiled image) to compose all figures into one file
+ncols, nrows: optional report layout, panels per row and rows per page (tiled pdf pages are raster images)
 """
 
 import numpy as np
@@ -16,61 +20,80 @@ from scipy import stats
 from statsmodels.stats.multicomp import pairwise_tukeyhsd
 import statsmodels.api as sm
 from statsmodels.formula.api import ols
+from functions.figure_writer import figure_writer, save_figure
+from functions.parallel import map_partitions
 pd.set_option('display.width', 320, "display.max_columns", 10)  # for display in pycharm console
 
 
-def main(f):
+# x-axis units and file name label for the histograms
+hist_info = {'Daily Individual Ingestion Rate': dict(units=r'$\rm m^{-2} day^{-1}$)', fname='individual'),
+             'Community Ingestion Rate': dict(units=r'$\rm ind^{-2} day^{-1}$)', fname='community')}
+
+
+def experiment_histogram(expt, dfi, t, figdir, writer=None):
+    ingestion_rates = dfi[t].tolist()
+    mn = round(np.nanmean(ingestion_rates), 2)
+    stdev = round(np.nanstd(ingestion_rates, ddof=1), 2)
+    n = len(ingestion_rates)
+
+    # test that data are normally distributed
+    w, pvalue = stats.shapiro(ingestion_rates)
+    if pvalue < .05:
+        nd = 'No'
+    else:
+        nd = 'Yes'
+
+    msg = ['-------------', t, 'Experiment: {}'.format(expt),
+           'Ingestion rate (m/day)\n Avg = {} \n SD = {} \n n = {}'.format(mn, stdev, n),
+           'Data are normally distributed? {}'.format(nd)]
+
+    fig, ax = plt.subplots()
+    ax.hist(dfi[t])
+    xlab = '{} \n({}g Chl-a equiv'.format(t, chr(956))
+    ax.set_xlabel(' '.join((xlab, hist_info[t]['units'])))  # \rm removes the italics
+    plt_fname = 'hist_ingestion_rate_{}_{}.png'.format(hist_info[t]['fname'], expt)
+    plt.title('Histogram of ingestion rates: {}'.format(expt))
+    ax.set_ylabel('Frequency')
+
+    atext = AnchoredText('Shapiro-Wilk\nNormally distritubed? {}\np = {}'.format((nd), '{:.7f}'.format(pvalue)),
+                         loc='upper right', frameon=False, pad=1.5)
+    ax.add_artist(atext)
+
+    plt.tight_layout()
+    plt_save = os.path.join(figdir, plt_fname)
+    save_figure(fig, plt_save, writer)
+
+    return ingestion_rates, msg
+
+
+def main(f, n_jobs=1, outdir=None, report=None, ncols=None, nrows=None):
     df = pd.read_excel(f, sheet_name='forpython')
     spath = os.path.split(os.path.dirname(f))[0]
+    figdir = outdir or os.path.join(spath, 'figs')
+
+    # write figures in the background, or compose them into a report in this process. Worker processes are forked
+    # from this process, so with n_jobs > 1 no writer threads are started: the figures are written directly, and the
+    # histograms for each experiment are written by the workers
+    report_fname = os.path.join(figdir, '{}_report'.format(os.path.splitext(os.path.basename(f))[0]))
+    if n_jobs > 1 and not report:
+        writer = None
+    else:
+        writer = figure_writer(report, report_fname, ncols, nrows)
+        n_jobs = 1
 
     type = ['Daily Individual Ingestion Rate', 'Community Ingestion Rate']
     for t in type:
         dft = df[['Experiment', t]]
-        expts = np.unique(dft['Experiment']).tolist()
+
+        # summary stats and histograms for each experiment, in parallel if n_jobs > 1
+        results = map_partitions(experiment_histogram, dict(dfi=dft), partition_col='Experiment', n_jobs=n_jobs,
+                                 t=t, figdir=figdir, writer=writer)
+        expts = []
         bplot = []
-        for expt in expts:
-            dfi = dft.loc[df['Experiment'] == expt]
-            ingestion_rates = dfi[t].tolist()
+        for expt, (ingestion_rates, msg) in results:
+            expts.append(expt)
             bplot.append(ingestion_rates)
-            mn = round(np.nanmean(ingestion_rates), 2)
-            stdev = round(np.nanstd(ingestion_rates, ddof=1), 2)
-            n = len(ingestion_rates)
-
-            # test that data are normally distributed
-            w, pvalue = stats.shapiro(ingestion_rates)
-            if pvalue < .05:
-                nd = 'No'
-            else:
-                nd = 'Yes'
-
-            print('-------------')
-            print(t)
-            print('Experiment: {}'.format(expt))
-            print('Ingestion rate (m/day)\n Avg = {} \n SD = {} \n n = {}'.format(mn, stdev, n))
-            print('Data are normally distributed? {}'.format(nd))
-
-            fig, ax = plt.subplots()
-            try:
-                ax.hist(dfi['Daily Individual Ingestion Rate'])
-                xlab = 'Daily Individual Ingestion Rate \n({}g Chl-a equiv'.format(chr(956))
-                ax.set_xlabel(' '.join((xlab, r'$\rm m^{-2} day^{-1}$)')))  # \rm removes the italics
-                plt_fname = 'hist_ingestion_rate_individual_{}.png'.format(expt)
-            except KeyError:
-                ax.hist(dfi['Community Ingestion Rate'])
-                xlab = 'Community Ingestion Rate \n({}g Chl-a equiv'.format(chr(956))
-                ax.set_xlabel(' '.join((xlab, r'$\rm ind^{-2} day^{-1}$)')))  # \rm removes the italics
-                plt_fname = 'hist_ingestion_rate_community_{}.png'.format(expt)
-            plt.title('Histogram of ingestion rates: {}'.format(expt))
-            ax.set_ylabel('Frequency')
-
-            atext = AnchoredText('Shapiro-Wilk\nNormally distritubed? {}\np = {}'.format((nd), '{:.7f}'.format(pvalue)),
-                                 loc='upper right', frameon=False, pad=1.5)
-            ax.add_artist(atext)
-
-            plt.tight_layout()
-            plt_save = os.path.join(spath, 'figs', plt_fname)
-            plt.savefig(str(plt_save), dpi=150)
-            plt.close
+            print('\n'.join(msg))
 
         fig, ax = plt.subplots()
 
@@ -90,9 +113,8 @@ def main(f):
             plt_fname = 'ingestion_rate_community.png'
 
         plt.tight_layout()
-        plt_save = os.path.join(spath, 'figs', plt_fname)
-        plt.savefig(str(plt_save), dpi=150)
-        plt.close
+        plt_save = os.path.join(figdir, plt_fname)
+        save_figure(fig, plt_save, writer)
 
         # calculate stats, from https://reneshbedre.github.io/blog/anova.html
         # pivot dataframe
@@ -145,11 +167,13 @@ def main(f):
         ax.add_artist(atext)
 
         plt.tight_layout()
-        plt_save = os.path.join(spath, 'figs', plt_fname)
-        plt.savefig(str(plt_save), dpi=150)
-        plt.close
+        plt_save = os.path.join(figdir, plt_fname)
+        save_figure(fig, plt_save, writer)
+
+    if writer is not None:
+        writer.close()
 
 
 if __name__ == '__main__':
     fname = '/Users/lgarzio/Documents/rucool/Saba/Ross_Sea/Ross_Sea2018_grazing/data/Krill_grazing_stats.xlsx'
-    main(fname)
+    main(fname, n_jobs=1)
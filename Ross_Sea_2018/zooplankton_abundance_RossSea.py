@@ -3,19 +3,27 @@
 Created on Apr 16 2020 by Lori Garzio
 @brief Creates a bar chart of zooplankton abundance
 fname: file containing zooplankton abundance data
+outdir: optional output directory, default is the directory containing fname (tables) and its zooplankton_figs
+subdirectory (figures)
+Also calculates diversity indices for each tow and the Bray-Curtis dissimilarity between tows
+report: optional report format (pdf, or png for a tiled image) to compose all figures into one file
+ncols, nrows: optional report layout, panels per row and rows per page (tiled pdf pages are raster images)
 """
 
 import numpy as np
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
+from functions.community import diversity_indices, bray_curtis
+from functions.figure_writer import figure_writer, save_figure
+from functions.sparse import SparseAbundance
 plt.rcParams['font.family'] = 'Times'
 plt.rcParams['mathtext.fontset'] = 'stix'
 plt.rcParams.update({'font.size': 15})
 pd.set_option('display.width', 320, "display.max_columns", 15)  # for display in pycharm console
 
 
-def stacked_bar_chart(dataframe, group_list, column_name, sname, fpath, colors=None):
+def stacked_bar_chart(dataframe, group_list, column_name, sname, figdir, colors=None, writer=None):
     fig, ax = plt.subplots()
     if len(np.unique(dataframe['Tow'])) > 3:
         bar_width = 0.6
@@ -64,39 +72,56 @@ def stacked_bar_chart(dataframe, group_list, column_name, sname, fpath, colors=N
     ax.legend(handles[::-1], labels[::-1], loc=(legend_x, 0.35), fontsize=10, frameon=False)
     plt.tight_layout()
 
-    plt_save = os.path.join(fpath, 'zooplankton_figs', sname)
-    plt.savefig(str(plt_save), dpi=150)
-    plt.close
+    plt_save = os.path.join(figdir, sname)
+    save_figure(fig, plt_save, writer)
 
 
-def main(f):
+def main(f, outdir=None, report=None, ncols=None, nrows=None):
+    sdir = outdir or os.path.dirname(f)
+    figdir = outdir or os.path.join(os.path.dirname(f), 'zooplankton_figs')
+    report_fname = os.path.join(figdir, '{}_report'.format(os.path.splitext(os.path.basename(f))[0]))
+    writer = figure_writer(report, report_fname, ncols, nrows)  # write figures in the background
+
     # plots by time period
     df = pd.read_excel(f, sheet_name='abundance')
-    df = df.melt(id_vars='Tow', var_name='Species', value_name='abundance_count_per_m3')
+    abundance = SparseAbundance.from_wide(df, 'Tow')
     df_key = pd.read_excel(f, sheet_name='key')
-    df = pd.merge(df, df_key, on=['Tow'], how='outer')
-    #df.sort_values(by=['Tow'], inplace=True)  # make sure the dataframe is sorted
 
-    time_pds = [x for x in np.unique(df['Period']) if 'no_period' not in x]
+    time_pds = [x for x in np.unique(df_key['Period']) if 'no_period' not in x]
 
     species = ['E. crystallorophias adult', 'E. crystallorophias juveniles', 'T. macrura', 'Copepods',
                'Amphipods', 'Pteropods', 'P. antarctica adult/juvenile', 'P. antarctica larvae']
     cols = ['red', 'firebrick', 'darkorange', 'xkcd:maize', 'darkgreen', 'steelblue', 'indigo', 'gray']
 
     for tp in time_pds:
-        df_tp = df[df['Period'] == tp]
+        # long-form abundance for only the tows in this time period, in the order of the key sheet
+        key_tp = df_key[df_key['Period'] == tp]
+        missing = [tow for tow in key_tp['Tow'] if tow not in abundance.rows]
+        if len(missing) > 0:
+            print('{}: no abundance data for tows {}, skipping'.format(tp, missing))
+        key_tp = key_tp[~key_tp['Tow'].isin(missing)]
+        df_tp = abundance.to_long(rows=key_tp['Tow'].tolist(), row_name='Tow', taxon_name='Species')
+        df_tp = pd.merge(df_tp, key_tp, on=['Tow'])
 
         # plot all tows per time period
         #species = np.unique(df_tp['Species']).tolist()
         #cols = cm.tab20(np.linspace(0, 1, len(species)))
         #cols = cm.rainbow(np.linspace(0, 1, len(species)))
 
-        stacked_bar_chart(df_tp, species, 'Species', '_'.join((tp, 'zoop_abundance.png')), os.path.dirname(f), cols)
+        stacked_bar_chart(df_tp, species, 'Species', '_'.join((tp, 'zoop_abundance.png')), figdir, cols,
+                          writer)
 
         # plot only the tows for biomass comparison
         df_tp_bc = df_tp[df_tp['Comparison'] == 'yes']
         stacked_bar_chart(df_tp_bc, species, 'Species', '_'.join((tp, 'zoop_abundance_biomasscompare.png')),
-                          os.path.dirname(f), cols)
+                          figdir, cols, writer)
+
+    # community diversity for each tow and Bray-Curtis dissimilarity between tows
+    diversity_indices(abundance).to_csv(os.path.join(sdir, 'zoop_diversity_indices.csv'),
+                                        index_label='Tow')
+    bray_curtis(abundance).to_csv(os.path.join(sdir, 'zoop_braycurtis_dissimilarity.csv'))
+
+    writer.close()
 
 
 if __name__ == '__main__':
@@ -3,19 +3,23 @@
 Created on May 11 2020 by Lori Garzio
 @brief Creates a bar chart of zooplankton abundance
 fname: file containing zooplankton abundance data
+outdir: optional output directory for the figures, default is figs in the parent of the directory containing fname
+report: optional report format (pdf, or png for a tiled image) to compose all figures into one file
+ncols, nrows: optional report layout, panels per row and rows per page (tiled pdf pages are raster images)
 """
 
 import numpy as np
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
+from functions.figure_writer import figure_writer, save_figure
 plt.rcParams['font.family'] = 'Times'
 plt.rcParams['mathtext.fontset'] = 'stix'
 plt.rcParams.update({'font.size': 16})
 pd.set_option('display.width', 320, "display.max_columns", 15)  # for display in pycharm console
 
 
-def stacked_bar_chart(dataframe, group_list, column_name, sname, fpath, colors=None):
+def stacked_bar_chart(dataframe, group_list, column_name, sname, figdir, colors=None, writer=None):
     fig, ax = plt.subplots()
     bar_width = 0.8
 
@@ -53,14 +57,17 @@ def stacked_bar_chart(dataframe, group_list, column_name, sname, fpath, colors=N
     ax.legend(handles[::-1], labels[::-1], loc=(legend_x, 0.35), fontsize=10, frameon=False)  # reverse legend display
     plt.tight_layout()
 
-    plt_save = os.path.join(fpath, 'figs', sname)
-    plt.savefig(str(plt_save), dpi=150)
-    plt.close
+    plt_save = os.path.join(figdir, sname)
+    save_figure(fig, plt_save, writer)
 
 
-def main(f):
-    # plots by time period
+def main(f, outdir=None, report=None, ncols=None, nrows=None):
     spath = os.path.split(os.path.dirname(f))[0]
+    figdir = outdir or os.path.join(spath, 'figs')
+    report_fname = os.path.join(figdir, '{}_report'.format(os.path.splitext(os.path.basename(f))[0]))
+    writer = figure_writer(report, report_fname, ncols, nrows)  # write figures in the background
+
+    # plots by time period
     sheets = ['percent_abundance', 'abundance_ind_m2']
     for sh in sheets:
         df = pd.read_excel(f, sheet_name=sh)
@@ -69,9 +76,8 @@ def main(f):
             ax.bar(df['Tow'], df['Total'], color='k')
             ax.set_ylabel(r'Total Zooplankton Abundance (ind $\rm m^{-2}$)')  # \rm removes the italics'
 
-            plt_save = os.path.join(spath, 'figs', 'zoop_abundance_total.png')
-            plt.savefig(str(plt_save), dpi=150)
-            plt.close
+            plt_save = os.path.join(figdir, 'zoop_abundance_total.png')
+            save_figure(fig, plt_save, writer)
 
         elif sh == 'percent_abundance':
             colname = 'percent_abundance'
@@ -81,7 +87,9 @@ def main(f):
                        'P. antarctica larvae', 'Other rare']
             cols = ['forestgreen', 'firebrick', 'cornflowerblue', 'orange', 'blue', 'xkcd:warm purple', 'xkcd:sun yellow']
 
-            stacked_bar_chart(df, species, 'Species', 'zoop_{}.png'.format(sh), spath, cols)
+            stacked_bar_chart(df, species, 'Species', 'zoop_{}.png'.format(sh), figdir, cols, writer)
+
+    writer.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+@brief Functions to calculate volume-normalized zooplankton abundance from raw taxon counts, sample split fractions
+and net tow volumes
+"""
+
+import numpy as np
+
+
+def calculate_volume_sampled(df, rotor_constant, r):
+    """
+    Calculate the volume of water sampled by a zooplankton net from flowmeter readings
+    :param df: dataframe containing columns flowmeter_start and flowmeter_end
+    :param rotor_constant: rotor constant specific to the flowmeter
+    :param r: radius of net opening in meters
+    :returns: dataframe with added columns flowmeter_diff and vol_sampled_m3
+    """
+    df['flowmeter_diff'] = df['flowmeter_end'] - df['flowmeter_start']
+
+    # (distance m) * (area of net opening m3)
+    df['vol_sampled_m3'] = (df['flowmeter_diff'] * rotor_constant / 999999) * (3.14 * r * r)
+    return df
+
+
+def calculate_abundance(counts, splits, tows, keys=None, taxon_cols=None, count_col='count',
+                        split_col='split_fraction', vol_col='vol_sampled_m3', depth_col='tow_depth_m',
+                        split_keys=None):
+    """
+    Join raw taxon counts to sample split fractions and net tow volumes and calculate abundance for every tow and
+    taxon at once. Counts are divided by the fraction of the sample that was counted, then normalized by the volume of
+    water sampled (ind/m3) and, if tow depth is available, integrated over the tow depth (ind/m2). Multiple count rows
+    for the same tow and taxon (e.g. several aliquots) are summed.
+    :param counts: long-form dataframe of raw counts, one row per tow/taxon (or tow/taxon/aliquot)
+    :param splits: dataframe of split fractions (fraction of the sample counted), one row per tow, or one row per
+    split_keys
+    :param tows: dataframe of net tows containing the volume sampled (see calculate_volume_sampled), one row per tow
+    :param keys: list of columns identifying a tow, default ['tow']. Use e.g. ['cruise', 'tow'] for multi-cruise
+    archives where tow IDs are reused between cruises
+    :param taxon_cols: list of columns identifying a taxon, default ['type', 'species'] (whichever are present)
+    :param count_col: column in counts containing the number of individuals counted
+    :param split_col: column in splits containing the fraction of the sample counted
+    :param vol_col: column in tows containing the volume of water sampled in m3
+    :param depth_col: column in tows containing the tow depth in m, used for ind/m2
+    :param split_keys: list of columns joining the split fractions to the counts, default is keys. Must include keys,
+    add columns (e.g. ['tow', 'aliquot']) to apply a different split to each count row
+    :returns: dataframe with one row per tow and taxon with columns count, count_total, vol_sampled_m3,
+    abundance_count_per_m3 and (if depth_col is available) abundance_count_per_m2
+    """
+    keys = keys or ['tow']
+    if taxon_cols is None:
+        taxon_cols = [c for c in ['type', 'species'] if c in counts.columns]
+
+    split_keys = split_keys or keys
+    missing_keys = [k for k in keys if k not in split_keys]
+    if len(missing_keys) > 0:
+        raise KeyError('split_keys missing tow identifier columns: {}'.format(missing_keys))
+    missing_keys = [k for k in split_keys if k not in splits.columns or k not in counts.columns]
+    if len(missing_keys) > 0:
+        raise KeyError('Split fractions or counts missing columns: {}'.format(missing_keys))
+
+    tow_cols = keys + [vol_col]
+    if depth_col in tows.columns:
+        tow_cols.append(depth_col)
+
+    # hash join on the tow identifiers; validate that there is only one split fraction per key
+    df = counts.merge(splits[split_keys + [split_col]], on=split_keys, how='left', validate='many_to_one')
+    missing = df.loc[df[split_col].isnull(), keys].drop_duplicates()
+    if len(missing) > 0:
+        raise ValueError('Missing split fractions for tows: {}'.format(missing.to_dict('records')))
+
+    df['count_total'] = df[count_col] / df[split_col]
+    summary = df.groupby(keys + taxon_cols, sort=False)[[count_col, 'count_total']].sum().reset_index()
+
+    # hash join on the tow identifiers; validate that there is only one tow record per key
+    summary = summary.merge(tows[tow_cols], on=keys, how='left', validate='many_to_one')
+    missing = summary.loc[summary[vol_col].isnull(), keys].drop_duplicates()
+    if len(missing) > 0:
+        raise ValueError('Missing tow volumes for tows: {}'.format(missing.to_dict('records')))
+
+    summary['abundance_count_per_m3'] = summary['count_total'] / summary[vol_col]
+    if depth_col in summary.columns:
+        summary['abundance_count_per_m2'] = summary['abundance_count_per_m3'] * summary[depth_col]
+
+    # a zero volume can't be normalized
+    summary.replace([np.inf, -np.inf], np.nan, inplace=True)
+
+    return summary
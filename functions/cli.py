@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+"""
+@brief Command line interface for the project scripts. Each subcommand accepts one or more input files or glob
+patterns, an optional output directory, the number of jobs and an optional JSON config file, so many datasets can be
+processed concurrently with a single call, e.g.
+zooplankton-tools ingestion 'data/DEBay_MP_expt*.xlsx' --outdir output -j 4
+The config file can contain options for all subcommands and a section for each subcommand, e.g.
+{"jobs": 4, "ingestion": {"format": "xlsx", "mc": 1000}}. Options given on the command line take precedence.
+The abundance, krill-length and ingestion-plots subcommands can compose all figures for each input into one report
+(--report pdf or png) with shared styling set once (--style), instead of writing one file per figure.
+The ingestion and sinking subcommands add their results to a time series history (--history), and the timeseries
+subcommand adds processed results (e.g. abundance tables) to the history and writes the statistics for each cruise,
+resampled (e.g. annual, seasonal) and rolling statistics across cruises, e.g.
+zooplankton-tools timeseries output/Fall2019_abundance_calculated.csv --history history --cruise Fall2019
+--value-col abundance_count_per_m3 --station-col tow
+"""
+
+import argparse
+import glob
+import importlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functions.results import OUTPUT_FORMATS
+
+# module containing the main function for each abundance project
+ABUNDANCE_PROJECTS = {'debay': 'DE_Bay_microplastics.zooplankton_abundance',
+                      'raritan': 'RaritanBay2019.RB_zooplankton_abundance',
+                      'rosssea': 'Ross_Sea_2018.zooplankton_abundance_RossSea',
+                      'rosssea-grazing': 'Ross_Sea_2018.zooplankton_abundance_RossSea_grazing'}
+
+
+def _script(module, style=None):
+    # import the script module when it's needed, so subcommands only import the dependencies they use
+    import matplotlib
+    matplotlib.use('Agg')
+    script = importlib.import_module(module)
+    if style:
+        # after the import, so the style overrides the rcParams set by the script
+        import matplotlib.pyplot as plt
+        plt.style.use(style)
+    return script
+
+
+def _expt(f, args):
+    # experiment name from the command line, or from the file name (e.g. DEBay_MP_expt1.xlsx)
+    if args.expt:
+        return args.expt
+    match = re.search(r'expt\d+', os.path.basename(f))
+    if match is None:
+        raise ValueError('Cannot determine the experiment from file name {}, use --expt'.format(f))
+    return match.group()
+
+
+def run_expt_time(f, args, n_jobs=1):
+    sdir = args.outdir or os.path.dirname(f)
+    csv_file = os.path.join(sdir, '{}_temp.csv'.format(os.path.splitext(os.path.basename(f))[0]))
+    _script('DE_Bay_microplastics.calculate_expt_time').main(f, csv_file)
+
+
+def run_water_volume(f, args, n_jobs=1):
+    _script('DE_Bay_microplastics.water_volume_sampled').main(f, args.rotor_constant, args.radius, args.outdir)
+
+
+def run_ingestion(f, args, n_jobs=1):
+    _script('DE_Bay_microplastics.ingestion_rates').main(f, _expt(f, args), n_jobs=n_jobs, out_fmt=args.format,
+                                                         n_mc=args.mc, outdir=args.outdir, history=args.history)
+
+
+def run_sinking(f, args, n_jobs=1):
+    _script('DE_Bay_microplastics.FP_sinking_rates').main(f, _expt(f, args), n_jobs=n_jobs, outdir=args.outdir,
+                                                          history=args.history)
+
+
+def run_abundance(f, args, n_jobs=1):
+    if args.project == 'debay' and args.tows:
+        # calculate abundance from the raw counts before plotting
+        _script('DE_Bay_microplastics.calculate_abundance').main(f, args.tows, args.outdir, args.keys)
+    else:
+        _script(ABUNDANCE_PROJECTS[args.project], args.style).main(f, outdir=args.outdir, report=args.report,
+                                                                    ncols=args.ncols, nrows=args.nrows)
+
+
+def run_krill_length(f, args, n_jobs=1):
+    _script('Ross_Sea_2018.krill_length', args.style).main(f, outdir=args.outdir, report=args.report, ncols=args.ncols,
+                                                           nrows=args.nrows)
+
+
+def run_ingestion_plots(f, args, n_jobs=1):
+    _script('Ross_Sea_2018.plot_ingestion_rates', args.style).main(f, n_jobs=n_jobs, outdir=args.outdir,
+                                                                  report=args.report, ncols=args.ncols,
+                                                                  nrows=args.nrows)
+
+
+def run_validate(f, args, n_jobs=1):
+    from functions.validation import check, validate_file
+    sdir = args.outdir or os.path.dirname(f)
+    report_file = os.path.join(sdir, '{}_validation.csv'.format(os.path.splitext(os.path.basename(f))[0]))
+    check(validate_file(f), f, report_file)
+
+
+def run_timeseries(f, args, n_jobs=1):
+    import pandas as pd
+    from functions.timeseries import append_history, sufficient_stats
+    if not args.value_col:
+        raise ValueError('Provide the column containing the values with --value-col')
+    df = pd.read_csv(f)
+    if args.cruise:
+        df[args.cruise_col] = args.cruise
+    source = os.path.splitext(os.path.basename(f))[0]
+    stats = sufficient_stats(df, args.variable or args.value_col, args.value_col, source, station_col=args.station_col,
+                             cruise_col=args.cruise_col)
+    append_history(args.history, stats)
+
+
+def write_timeseries(args):
+    from functions.timeseries import cruise_summary, load_history, resample_stats, rolling_stats
+    stats = load_history(args.history)
+    if len(stats) == 0:
+        raise ValueError('No statistics found in {}'.format(args.history))
+    sdir = args.outdir or args.history
+    cruise_summary(stats).to_csv(os.path.join(sdir, 'timeseries_cruise_summary.csv'), index=False)
+    resample_stats(stats, args.freq).to_csv(os.path.join(sdir, 'timeseries_{}.csv'.format(args.freq)), index=False)
+    rolling_stats(stats, args.window).to_csv(os.path.join(sdir, 'timeseries_rolling{}.csv'.format(args.window)),
+                                             index=False)
+    print('Wrote time series statistics for {} cruises to {}'.format(stats['cruise'].nunique(), sdir))
+
+
+def expand_inputs(patterns):
+    """
+    Expand file names and glob patterns into a list of files
+    :param patterns: list of file names or glob patterns
+    :returns: list of unique files, sorted within each pattern
+    """
+    files = []
+    for p in patterns:
+        matches = sorted(glob.glob(os.path.expanduser(p)))
+        if len(matches) == 0:
+            raise ValueError('No files found matching {}'.format(p))
+        files.extend([m for m in matches if m not in files])
+    return files
+
+
+def load_config(config_file, command):
+    """
+    Load options from a JSON config file
+    :param config_file: JSON file containing options for all subcommands and/or a section for each subcommand
+    :param command: subcommand being run
+    :returns: dictionary of options for the subcommand, with the option names as argparse destinations
+    """
+    with open(config_file) as cf:
+        config = json.load(cf)
+    options = {k: v for k, v in config.items() if not isinstance(v, dict)}
+    options.update(config.get(command, dict()))
+    return {k.replace('-', '_'): v for k, v in options.items()}
+
+
+def build_parser():
+    """
+    :returns: the argument parser and a dictionary of the subcommand parsers
+    """
+    parser = argparse.ArgumentParser(prog='zooplankton-tools', description=__doc__.split('\n')[1])
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('inputs', nargs='*', help='Input files or glob patterns')
+    common.add_argument('-o', '--outdir', help='Output directory, default is the location used by each script')
+    common.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of worker processes. Multiple inputs are processed concurrently, a single input '
+                             'uses the workers within the script where supported')
+    common.add_argument('-c', '--config', help='JSON config file containing default options')
+
+    # options for the subcommands that make several figures per input
+    figures = argparse.ArgumentParser(add_help=False)
+    figures.add_argument('--report', choices=['pdf', 'png'],
+                         help='Compose all figures for each input into one report: a multi-page pdf (one vector page '
+                              'per figure) or a tiled png image')
+    figures.add_argument('--ncols', type=int,
+                         help='Report panels per row, default is 1 for pdf and 3 for png. Pdf pages with more than one '
+                              'panel are raster images of the figures')
+    figures.add_argument('--nrows', type=int,
+                         help='Report rows of panels per page (pdf) or per image (png, numbered <name>_1.png, ...), '
+                              'default is 3 for tiled pdf pages and all rows in one png')
+    figures.add_argument('--style', help='matplotlib style name or file applied to all figures')
+
+    sp = subparsers.add_parser('validate', parents=[common],
+                               help='Check the data sheets for errors and write a report, without running the analysis')
+    sp.set_defaults(func=run_validate)
+
+    sp = subparsers.add_parser('expt-time', parents=[common], help='Calculate experiment time in hours')
+    sp.set_defaults(func=run_expt_time)
+
+    sp = subparsers.add_parser('water-volume', parents=[common], help='Calculate the volume of water sampled')
+    sp.add_argument('--rotor-constant', type=float, default=26873, help='Rotor constant specific to the flowmeter')
+    sp.add_argument('--radius', type=float, default=0.25, help='Radius of the net opening in meters')
+    sp.set_defaults(func=run_water_volume)
+
+    sp = subparsers.add_parser('ingestion', parents=[common], help='Calculate zooplankton ingestion rates')
+    sp.add_argument('--expt', help='Experiment to analyze, default is inferred from the file name')
+    sp.add_argument('--format', default='csv', choices=OUTPUT_FORMATS,
+                    help='Output format for the summary tables')
+    sp.add_argument('--mc', type=int, default=0,
+                    help='Number of Monte Carlo replicates for ingestion rate confidence intervals (0 to skip)')
+    sp.add_argument('--history', help='Time series history directory the ingestion rates are added to')
+    sp.set_defaults(func=run_ingestion)
+
+    sp = subparsers.add_parser('sinking', parents=[common], help='Calculate fecal pellet sinking rates')
+    sp.add_argument('--expt', help='Experiment to analyze, default is inferred from the file name')
+    sp.add_argument('--history', help='Time series history directory the sinking rates are added to')
+    sp.set_defaults(func=run_sinking)
+
+    sp = subparsers.add_parser('abundance', parents=[common, figures], help='Calculate and plot zooplankton abundance')
+    sp.add_argument('--project', default='debay', choices=sorted(ABUNDANCE_PROJECTS.keys()),
+                    help='Project the abundance data are from')
+    sp.add_argument('--tows', help='DE Bay only: csv file containing volume sampled and tow depth for each tow. If '
+                                   'provided, abundance is calculated from the raw counts instead of plotted')
+    sp.add_argument('--keys', nargs='+', help='DE Bay only: columns identifying a tow in the counts, splits and tows. '
+                                              'Default is cruise and tow if all three have a cruise column, '
+                                              'otherwise tow')
+    sp.set_defaults(func=run_abundance)
+
+    sp = subparsers.add_parser('krill-length', parents=[common, figures], help='Krill length statistics (Ross Sea)')
+    sp.set_defaults(func=run_krill_length)
+
+    sp = subparsers.add_parser('ingestion-plots', parents=[common, figures], help='Plot ingestion rates (Ross Sea)')
+    sp.set_defaults(func=run_ingestion_plots)
+
+    sp = subparsers.add_parser('timeseries', parents=[common],
+                               help='Add processed results (csv) to a time series history and write the statistics '
+                                    'across cruises. Without inputs, only writes the statistics')
+    sp.add_argument('--history', required=True, help='Time series history directory')
+    sp.add_argument('--value-col', help='Column containing the values, required with inputs')
+    sp.add_argument('--variable', help='Name of the variable in the history, default is the value column')
+    sp.add_argument('--station-col', default='station', help='Column containing the station or treatment')
+    sp.add_argument('--cruise-col', default='cruise', help='Column containing the cruise')
+    sp.add_argument('--cruise', help='Cruise name or date for all values, for inputs without a cruise column')
+    sp.add_argument('--freq', default='Y',
+                    help="Resampling frequency: a pandas period frequency (e.g. Y, Q) or 'season' for seasonal "
+                         "statistics across years")
+    sp.add_argument('--window', type=int, default=3, help='Number of cruises in each rolling window')
+    sp.set_defaults(func=run_timeseries, finalize=write_timeseries)
+
+    return parser, subparsers.choices
+
+
+def main(argv=None):
+    parser, subcommands = build_parser()
+    args = parser.parse_args(argv)
+    if args.config:
+        # options from the config file are defaults, so anything given on the command line takes precedence
+        subcommands[args.command].set_defaults(**load_config(args.config, args.command))
+        args = parser.parse_args(argv)
+
+    # subcommands with a finalize step (e.g. timeseries) can run without inputs
+    finalize = getattr(args, 'finalize', None)
+    if len(args.inputs) == 0 and finalize is None:
+        parser.error('No input files provided')
+    try:
+        files = expand_inputs(args.inputs)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.outdir:
+        os.makedirs(args.outdir, exist_ok=True)
+
+    failed = []
+    if len(files) <= 1 or args.jobs < 2:
+        for f in files:
+            try:
+                args.func(f, args, n_jobs=args.jobs if len(files) == 1 else 1)
+                print('Finished {}'.format(f))
+            except Exception as e:
+                failed.append(f)
+                print('Failed {}: {}'.format(f, e))
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(files))) as executor:
+            futures = [(f, executor.submit(args.func, f, args)) for f in files]
+            for f, future in futures:
+                try:
+                    future.result()
+                    print('Finished {}'.format(f))
+                except Exception as e:
+                    failed.append(f)
+                    print('Failed {}: {}'.format(f, e))
+
+    if finalize is not None and not failed:
+        try:
+            finalize(args)
+        except Exception as e:
+            failed.append(args.command)
+            print('Failed {}: {}'.format(args.command, e))
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
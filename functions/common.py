@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+"""
+@brief Common functions shared by the zooplankton-tools scripts
+"""
+
+import re
+
+
+def treatment_label(treatment):
+    """
+    Get the display label for a station or treatment name
+    :param treatment: station or treatment name from the data file, e.g. 'inside_front'
+    :returns: display label, e.g. 'Inside Front'. Names without a defined label are returned unchanged
+    """
+    labels = dict(inside_front='Inside Front', outside_front='Outside Front', algae='Algal Culture',
+                  algae_plastic='Algal Culture + Plastic')
+    return labels.get(treatment, treatment)
+
+
+def cruise_label(cruise):
+    """
+    Get the display label for a cruise name
+    :param cruise: cruise name from the data file, e.g. 'Fall2019'
+    :returns: display label with a space between the season and year, e.g. 'Fall 2019'
+    """
+    return re.sub(r'([A-Za-z])(\d)', r'\1 \2', str(cruise))
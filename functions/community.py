@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+@brief Community diversity and similarity metrics for station/tow x taxon abundance tables
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from functions.sparse import SparseAbundance
+
+
+def _as_csr(abundance):
+    # sparse rows x taxa matrix and row labels from a SparseAbundance or a wide dataframe (rows x taxa)
+    if isinstance(abundance, SparseAbundance):
+        return abundance.matrix, abundance.rows
+    return sparse.csr_matrix(np.nan_to_num(abundance.values.astype(float))), abundance.index
+
+
+def diversity_indices(abundance):
+    """
+    Calculate diversity indices for each row (station or tow): taxon richness, Shannon diversity
+    H' = -sum(p * ln(p)) and Simpson diversity 1 - sum(p^2), where p is the proportion of each taxon in the row
+    :param abundance: SparseAbundance, or wide dataframe with one row per station/tow and one column per taxon
+    :returns: dataframe indexed by station/tow with columns total, richness, shannon and simpson
+    """
+    matrix, rows = _as_csr(abundance)
+    matrix = matrix.copy()
+    matrix.eliminate_zeros()
+
+    totals = np.asarray(matrix.sum(axis=1)).ravel()
+    richness = np.diff(matrix.indptr)
+
+    # proportion of each taxon, calculated on the nonzero entries only
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = matrix.data / np.repeat(totals, richness)
+        shannon_terms = sparse.csr_matrix((-p * np.log(p), matrix.indices, matrix.indptr), shape=matrix.shape)
+        simpson_terms = sparse.csr_matrix((p * p, matrix.indices, matrix.indptr), shape=matrix.shape)
+    shannon = np.asarray(shannon_terms.sum(axis=1)).ravel()
+    simpson = 1 - np.asarray(simpson_terms.sum(axis=1)).ravel()
+
+    # indices are undefined for rows without any individuals
+    empty = totals == 0
+    shannon[empty] = np.nan
+    simpson[empty] = np.nan
+
+    return pd.DataFrame({'total': totals, 'richness': richness, 'shannon': shannon, 'simpson': simpson},
+                        index=rows)
+
+
+def bray_curtis(abundance, max_elements=1e6):
+    """
+    Calculate the pairwise Bray-Curtis dissimilarity between all rows (stations or tows):
+    BC = sum(|x_i - x_j|) / sum(x_i + x_j) = 1 - 2 * sum(min(x_i, x_j)) / (sum(x_i) + sum(x_j)).
+    The matrix is calculated with broadcasting in blocks of rows so that at most max_elements values are held in
+    memory at once, and only the upper triangle of blocks is calculated.
+    :param abundance: SparseAbundance, or wide dataframe with one row per station/tow and one column per taxon
+    :param max_elements: maximum number of row x row x taxon values calculated at once
+    :returns: dataframe of Bray-Curtis dissimilarity (0 = identical, 1 = no taxa in common), rows x rows
+    """
+    matrix, rows = _as_csr(abundance)
+
+    # drop taxa that are absent everywhere, they don't contribute
+    present = np.asarray((matrix != 0).sum(axis=0)).ravel() > 0
+    data = matrix[:, np.where(present)[0]].toarray()
+    n, n_taxa = data.shape
+    totals = data.sum(axis=1)
+
+    block = max(1, int(np.sqrt(max_elements / max(n_taxa, 1))))
+    bc = np.zeros((n, n))
+    for i0 in range(0, n, block):
+        xi = data[i0:i0 + block]
+        for j0 in range(i0, n, block):
+            xj = data[j0:j0 + block]
+            shared = np.minimum(xi[:, np.newaxis, :], xj[np.newaxis, :, :]).sum(axis=2)
+            denom = totals[i0:i0 + block, np.newaxis] + totals[np.newaxis, j0:j0 + block]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = 1 - 2 * shared / denom
+            values[denom == 0] = 0  # two empty rows are identical
+            bc[i0:i0 + block, j0:j0 + block] = values
+            bc[j0:j0 + block, i0:i0 + block] = values.T
+
+    return pd.DataFrame(bc, index=rows, columns=rows)
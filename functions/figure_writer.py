@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+"""
+@brief Write figures to disk in background threads so that image encoding and file I/O overlap with the computation
+and layout of the next figure, or compose them into a single report (multi-page pdf or tiled image)
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+
+# formats that can be encoded from an RGBA buffer, anything else is saved synchronously with savefig
+RASTER_FORMATS = ['png', 'jpg', 'jpeg', 'tif', 'tiff']
+
+
+def _render(fig, dpi):
+    # render a figure to an RGBA array and close it
+    fig.set_dpi(dpi)
+    canvas = FigureCanvasAgg(fig)
+    # print_to_buffer returns the RGBA bytes and size on all matplotlib versions (buffer_rgba is only an array from 3.1)
+    buf, (w, h) = canvas.print_to_buffer()
+    rgba = np.frombuffer(buf, np.uint8).reshape(h, w, 4).copy()
+    plt.close(fig)
+    return rgba
+
+
+def _imsave(fname, rgba, fmt, dpi):
+    if fmt in ['jpg', 'jpeg']:
+        rgba = rgba[:, :, :3]  # jpeg doesn't support transparency
+    mpimg.imsave(fname, rgba, format=fmt, dpi=dpi)
+
+
+class FigureWriter(object):
+    """
+    Render figures to RGBA buffers in the calling thread and queue them to a thread pool for encoding and writing.
+    The memory held by queued buffers is limited to max_queued_mb: save() blocks until enough queued figures have
+    been written. Call flush() (or use as a context manager) to wait for all figures to be written.
+    """
+    def __init__(self, dpi=150, max_workers=2, max_queued_mb=256):
+        """
+        :param dpi: default resolution of the output images
+        :param max_workers: number of background threads encoding and writing figures
+        :param max_queued_mb: maximum memory (MB) held by rendered figures waiting to be written
+        """
+        self.dpi = dpi
+        self.max_queued_bytes = max_queued_mb * 1e6
+        self._queued_bytes = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def save(self, fig, fname, dpi=None):
+        """
+        Render a figure and queue it to be written. The figure is closed once it has been rendered.
+        :param fig: matplotlib figure
+        :param fname: output file name, the format is determined by the extension
+        :param dpi: resolution of the output image, default is the writer's dpi
+        """
+        dpi = dpi or self.dpi
+        fmt = os.path.splitext(str(fname))[1].lstrip('.').lower()
+        if fmt not in RASTER_FORMATS:
+            fig.savefig(str(fname), dpi=dpi)
+            plt.close(fig)
+            return
+
+        rgba = _render(fig, dpi)
+
+        # backpressure: wait for queued figures to be written if the queue is over the memory limit
+        with self._condition:
+            while self._queued_bytes > 0 and self._queued_bytes + rgba.nbytes > self.max_queued_bytes:
+                self._condition.wait()
+            self._queued_bytes += rgba.nbytes
+
+        self._futures.append(self._executor.submit(self._write, rgba, str(fname), fmt, dpi))
+
+    def _write(self, rgba, fname, fmt, dpi):
+        nbytes = rgba.nbytes
+        try:
+            _imsave(fname, rgba, fmt, dpi)
+        finally:
+            with self._condition:
+                self._queued_bytes -= nbytes
+                self._condition.notify_all()
+
+    def flush(self):
+        """
+        Wait for all queued figures to be written. Errors raised while writing are re-raised here.
+        """
+        futures = self._futures
+        self._futures = []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """
+        Write all queued figures and shut down the background threads
+        """
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+class ReportWriter(object):
+    """
+    Compose all figures into one report instead of writing one file per figure. A pdf report has one vector page per
+    figure, or pages of nrows x ncols panels if ncols > 1. Tiled pdf pages are raster images of the panels (rendered
+    at the report dpi), only one figure per page is kept as vector graphics. Any other format (e.g. png) composes the
+    figures into a tiled image with ncols panels per row: one image for all figures, or one image per page of nrows
+    rows (numbered <name>_1.png, <name>_2.png, ...). Panels are padded to the size of the largest figure on the page.
+    Has the same save() interface as FigureWriter, so it can be passed to save_figure.
+    """
+    def __init__(self, fname, ncols=None, nrows=None, dpi=150):
+        """
+        :param fname: report file name, the format is determined by the extension
+        :param ncols: number of panels per row, default is 1 for pdf (vector pages) and 3 for images
+        :param nrows: number of rows of panels per page, default is 1 for pdf with one panel per row, 3 for tiled pdf
+        pages and all rows in one image
+        :param dpi: resolution of the panels
+        """
+        self.fname = str(fname)
+        self.fmt = os.path.splitext(self.fname)[1].lstrip('.').lower()
+        if self.fmt != 'pdf' and self.fmt not in RASTER_FORMATS:
+            raise ValueError('Report format {} not supported, options: {}'.format(self.fmt, ['pdf'] + RASTER_FORMATS))
+        self.dpi = dpi
+        self.files = []
+        self._panels = []
+        self._pdf = None
+        if self.fmt == 'pdf':
+            self.ncols = ncols or 1
+            self.nrows = nrows or (1 if self.ncols == 1 else 3)
+            self._pdf = PdfPages(self.fname)
+            self.files.append(self.fname)
+        else:
+            self.ncols = ncols or 3
+            self.nrows = nrows
+        self.vector = self._pdf is not None and self.ncols * self.nrows == 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def save(self, fig, fname=None, dpi=None):
+        """
+        Add a figure to the report. The figure is closed once it has been added.
+        :param fig: matplotlib figure
+        :param fname: file name the figure would have been saved to, not used (figures are added in order)
+        :param dpi: not used, panels are rendered at the report dpi
+        """
+        if self.vector:
+            self._pdf.savefig(fig)
+            plt.close(fig)
+            return
+
+        self._panels.append(_render(fig, self.dpi))
+        if self.nrows is not None and len(self._panels) == self.nrows * self.ncols:
+            self._write_page()
+
+    def _write_page(self):
+        tiled = tile_images(self._panels, self.ncols)
+        self._panels = []
+        if self._pdf is not None:
+            fig = plt.figure(figsize=(tiled.shape[1] / self.dpi, tiled.shape[0] / self.dpi), dpi=self.dpi)
+            fig.figimage(tiled)
+            self._pdf.savefig(fig, dpi=self.dpi)
+            plt.close(fig)
+            return
+
+        if self.nrows is None:
+            sfile = self.fname
+        else:
+            sfile = '{}_{}.{}'.format(os.path.splitext(self.fname)[0], len(self.files) + 1, self.fmt)
+        _imsave(sfile, tiled, self.fmt, self.dpi)
+        self.files.append(sfile)
+
+    def close(self):
+        """
+        Write the last page and close the report
+        """
+        try:
+            if len(self._panels) > 0:
+                self._write_page()
+        finally:
+            if self._pdf is not None:
+                self._pdf.close()
+
+
+def tile_images(images, ncols):
+    """
+    Compose images into a grid, left to right then top to bottom, on a white background
+    :param images: list of RGBA arrays (rows x columns x 4, uint8), each placed at the top left of a grid cell the size
+    of the largest image
+    :param ncols: number of images per row
+    :returns: RGBA array of the tiled image
+    """
+    h = max([im.shape[0] for im in images])
+    w = max([im.shape[1] for im in images])
+    ncols = min(ncols, len(images))
+    nrows = int(np.ceil(len(images) / float(ncols)))
+
+    tiled = np.full((nrows * h, ncols * w, 4), 255, dtype=np.uint8)
+    for i, im in enumerate(images):
+        row, col = divmod(i, ncols)
+        tiled[row * h:row * h + im.shape[0], col * w:col * w + im.shape[1]] = im
+    return tiled
+
+
+def figure_writer(report=None, report_fname=None, ncols=None, nrows=None):
+    """
+    Writer for a script's figures
+    :param report: optional report format (pdf, or an image format such as png for a tiled image). If None, each figure
+    is written to its own file in background threads
+    :param report_fname: report file name without the extension
+    :param ncols: optional number of panels per row in the report, see ReportWriter
+    :param nrows: optional number of rows of panels per report page, see ReportWriter
+    :returns: ReportWriter if report is provided, otherwise FigureWriter
+    """
+    if report:
+        return ReportWriter('.'.join((report_fname, report)), ncols=ncols, nrows=nrows)
+    return FigureWriter()
+
+
+def save_figure(fig, fname, writer=None, dpi=150):
+    """
+    Save and close a figure, queued to a FigureWriter if one is provided, otherwise written immediately
+    :param fig: matplotlib figure
+    :param fname: output file name
+    :param writer: optional FigureWriter or ReportWriter
+    :param dpi: resolution of the output image
+    """
+    if writer is not None:
+        writer.save(fig, fname, dpi=dpi)
+    else:
+        fig.savefig(str(fname), dpi=dpi)
+        plt.close(fig)
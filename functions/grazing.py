@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+"""
+@brief Functions to calculate zooplankton clearance and ingestion rates from chl-a grazing experiments
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def frost_equations(c_avg_t0, k, chl_tf, tmt_time, expt_vol_ml, num_copes):
+    """
+    Calculate clearance and ingestion rates using the equations of Frost (1972). Works on scalars or on arrays of any
+    shape that broadcast together.
+    :param c_avg_t0: average chl-a of the controls at t0 (ug/l)
+    :param k: phytoplankton growth rate calculated from the controls (1/hour)
+    :param chl_tf: chl-a of the treatment bottle at tf (ug/l)
+    :param tmt_time: experiment time of the treatment bottle (hours)
+    :param expt_vol_ml: volume of the treatment bottle (ml)
+    :param num_copes: number of copepods in the treatment bottle
+    :returns: clearance rate (mls/individual/hour) and ingestion rate (ug Chl/ind/hour)
+    """
+    neg_g_prime = np.log(chl_tf / c_avg_t0) / tmt_time
+    g = -neg_g_prime + k
+    clearance_rate = expt_vol_ml * g / num_copes  # clearance rate, mls/individual/hour
+    c = ((c_avg_t0 * ((np.exp(neg_g_prime * tmt_time)) - 1)) / (neg_g_prime * tmt_time)) / 1000  # ug/ml
+    ingest_rate_hour = clearance_rate * c  # ug Chl/ind/hour
+    return clearance_rate, ingest_rate_hour
+
+
+def time_point_labels(time_point):
+    """
+    Label each time point as t0 or tf
+    :param time_point: series of time points as entered in the chl-a sheet (e.g. t0, T0, tf, Tf)
+    :returns: array of labels t0, tf, or an empty string if the time point is neither
+    """
+    return np.where(time_point.str.contains('t0|T0'), 't0', np.where(time_point.str.contains('tf|Tf'), 'tf', ''))
+
+
+def calculate_ingestion_rates(cruise, chla, expt_data):
+    """
+    Calculate clearance and ingestion rates for each treatment bottle from one cruise. Chl-a and experiment times are
+    averaged for the control bottles at each station/treatment, and rates are calculated for each treatment bottle.
+    :param cruise: cruise name
+    :param chla: chl-a data for the cruise, normalized to the canonical columns (see functions.schema)
+    :param expt_data: experiment times for the cruise, normalized to the canonical columns (see functions.schema)
+    :returns: list of summary rows: [cruise, treatment, full_treatment, chl_t0, chl_tf, time_hours] for the control
+    averages and [cruise, treatment, full_treatment, chl_t0, chl_tf, time_hours, clearance_rate, ingest_rate_hour,
+    ingest_rate_day] for each treatment bottle
+    """
+    summary = []
+    if len(chla) == 0:
+        return summary
+
+    chla = chla.assign(btl_tp=chla['bottle'] + '_' + chla['time_point'])
+
+    # experiment time for each bottle
+    bottle_times = expt_data.groupby(['treatment', 'bottle'])['expt_time_hours'].agg(['first', 'size'])
+
+    stations = np.unique(chla['treatment']).tolist()
+    if stations == ['inside_front', 'outside_front']:
+        stations = ['outside_front', 'inside_front']
+    for sta in stations:
+        dfi = chla.loc[chla['treatment'] == sta]
+
+        # calculate average chl-a for the controls at each time point
+        controls = dfi[dfi['btl_tp'].str.contains('control')]
+        timepts = np.unique(controls['time_point']).tolist()
+        for tps in timepts:
+            if 't0' in tps or 'T0' in tps:
+                c_avg_t0 = np.average(controls[controls['time_point'] == tps]['chl_ug_l'])
+            elif 'tf' in tps or 'Tf' in tps:
+                c_avg_tf = np.average(controls[controls['time_point'] == tps]['chl_ug_l'])
+
+        # calculate the average experiment time for the controls
+        c_expt_time = np.average(expt_data.loc[(expt_data['treatment'] == sta) &
+                                               (expt_data['bottle'].str.contains('control'))]['expt_time_hours'])
+
+        summary.append([cruise, sta, '_'.join((sta, 'control_avg')), c_avg_t0, c_avg_tf, c_expt_time])
+
+        # calculate k from the controls
+        k = (np.log(c_avg_tf / c_avg_t0)) / c_expt_time
+
+        # add the treatment data to the summary
+        treatments = dfi[dfi['btl_tp'].str.contains('treatment')]
+        for i, row in treatments.iterrows():
+            btl_key = (sta, row['bottle'])
+            if btl_key in bottle_times.index and bottle_times.loc[btl_key, 'size'] == 1:
+                tmt_time = bottle_times.loc[btl_key, 'first']
+            else:
+                raise ValueError('Check experiment times: {} {} {}'.format(cruise, sta, row['bottle']))
+
+            clearance_rate, ingest_rate_hour = frost_equations(c_avg_t0, k, row['chl_ug_l'], tmt_time,
+                                                               row['expt_vol_ml'], row['num_copes'])
+            ingest_rate_day = ingest_rate_hour * 24  # ug Chl/ind/day
+
+            summary.append([cruise, row['treatment'], '_'.join((sta, row['bottle'])), c_avg_t0, row['chl_ug_l'],
+                            tmt_time, clearance_rate, ingest_rate_hour, ingest_rate_day])
+
+    return summary
+
+
+def experiment_arrays(chla, expt_data):
+    """
+    Split the chl-a data and experiment times into the control chl-a values, control experiment times and treatment
+    bottles used by the Monte Carlo uncertainty calculation
+    :param chla: chl-a data, normalized to the canonical columns (see functions.schema)
+    :param expt_data: experiment times, normalized to the canonical columns (see functions.schema)
+    :returns: dataframes of control chl-a (with time point t0 or tf), control experiment times and treatment bottles
+    (with chl-a, experiment time, volume and number of copepods), each with a station index column sid
+    """
+    chla = chla.assign(btl_tp=chla['bottle'] + '_' + chla['time_point'])
+    keys = ['cruise', 'treatment']
+
+    controls = chla[chla['btl_tp'].str.contains('control')].copy()
+    controls['tp'] = time_point_labels(controls['time_point'])
+    controls = controls[controls['tp'] != '']
+
+    control_times = expt_data[expt_data['bottle'].str.contains('control')]
+
+    bottles = chla[chla['btl_tp'].str.contains('treatment')]
+    bottle_times = expt_data.groupby(keys + ['bottle'])['expt_time_hours'].agg(['first', 'size']).reset_index()
+    bottles = bottles.merge(bottle_times, on=keys + ['bottle'], how='left')
+    bad_times = bottles[bottles['size'] != 1]
+    if len(bad_times) > 0:
+        row = bad_times.iloc[0]
+        raise ValueError('Check experiment times: {} {} {}'.format(row['cruise'], row['treatment'], row['bottle']))
+    bottles = bottles.rename(columns={'first': 'expt_time_hours'})
+
+    stations = bottles[keys].drop_duplicates().reset_index(drop=True)
+    stations['sid'] = np.arange(len(stations))
+    controls = controls.merge(stations, on=keys)
+    control_times = control_times.merge(stations, on=keys)
+    bottles = bottles.merge(stations, on=keys)
+
+    return controls, control_times, bottles
+
+
+def _station_sum(values, sid, n_stations):
+    # sum the columns of values (replicates x items) for each station, returns replicates x stations
+    values = np.atleast_2d(values)
+    n = values.shape[0]
+    idx = (np.arange(n)[:, None] * n_stations + sid[None, :]).ravel()
+    return np.bincount(idx, weights=values.ravel(), minlength=n * n_stations).reshape(n, n_stations)
+
+
+def _station_average(values, sid, n_stations):
+    # average the columns of values (replicates x items) for each station, returns replicates x stations
+    return _station_sum(values, sid, n_stations) / np.bincount(sid, minlength=n_stations)
+
+
+def _valid_average(values, sid, n_stations):
+    # average the finite values in the columns of values for each station, NaN for stations without finite values
+    valid = np.isfinite(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _station_sum(np.where(valid, values, 0), sid, n_stations) / _station_sum(valid, sid, n_stations)
+
+
+class _Histogram(object):
+    """
+    Streaming mean and quantiles of each column of arrays added in chunks, for Monte Carlo replicates. Each column is
+    counted in n_bins equal bins, the range is set from the first values (four times their range) and doubled, merging
+    pairs of bins, whenever a value falls outside it. Memory is columns x n_bins regardless of the number of values,
+    quantiles are interpolated within a bin so they are accurate to the bin width. NaNs are ignored.
+    """
+    def __init__(self, n_cols, n_bins=4096):
+        self.n_bins = n_bins
+        self.counts = np.zeros((n_cols, n_bins))
+        self.lo = np.full(n_cols, np.nan)
+        self.width = np.full(n_cols, np.nan)
+        self.n = np.zeros(n_cols)
+        self.sum = np.zeros(n_cols)
+
+    def _expand(self, col, vmin, vmax):
+        nb = self.n_bins
+        while vmin < self.lo[col] or vmax >= self.lo[col] + self.width[col] * nb:
+            merged = self.counts[col].reshape(nb // 2, 2).sum(axis=1)
+            self.counts[col] = 0
+            if vmin < self.lo[col]:
+                # extend the range down, the old bins become the upper half
+                self.counts[col, nb // 2:] = merged
+                self.lo[col] -= self.width[col] * nb
+            else:
+                self.counts[col, :nb // 2] = merged
+            self.width[col] *= 2
+
+    def update(self, values):
+        """
+        :param values: array of values (rows x columns)
+        """
+        finite = np.isfinite(values)
+        self.n += finite.sum(axis=0)
+        self.sum += np.where(finite, values, 0).sum(axis=0)
+        vmin = np.where(finite, values, np.inf).min(axis=0)
+        vmax = np.where(finite, values, -np.inf).max(axis=0)
+        for col in np.nonzero(finite.any(axis=0))[0]:
+            if np.isnan(self.lo[col]):
+                span = max(vmax[col] - vmin[col], abs(vmax[col]) * 1e-6, 1e-12)
+                self.lo[col] = vmin[col] - 1.5 * span
+                self.width[col] = 4 * span / self.n_bins
+            self._expand(col, vmin[col], vmax[col])
+
+        cols = np.nonzero(finite)[1]
+        bins = np.floor((values[finite] - self.lo[cols]) / self.width[cols]).astype(int)
+        flat = cols * self.n_bins + np.clip(bins, 0, self.n_bins - 1)
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def mean(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.n > 0, self.sum / self.n, np.nan)
+
+    def percentile(self, q):
+        """
+        :param q: list of percentiles (0-100)
+        :returns: array of percentiles x columns, NaN for columns without values
+        """
+        cum = np.cumsum(self.counts, axis=1)
+        result = np.full((len(q), len(self.n)), np.nan)
+        for col in np.nonzero(self.n > 0)[0]:
+            for i, p in enumerate(q):
+                # the k-th smallest value (from 0) is at the middle of its count, as in np.percentile
+                rank = p / 100. * (self.n[col] - 1) + 0.5
+                b = min(np.searchsorted(cum[col], rank), self.n_bins - 1)
+                before = cum[col, b - 1] if b > 0 else 0
+                result[i, col] = self.lo[col] + self.width[col] * (b + (rank - before) / self.counts[col, b])
+        return result
+
+
+def ingestion_rate_uncertainty(chla, expt_data, n_reps=1000, chl_cv=0.05, time_sd=0.1, vol_cv=0.01, ci=95,
+                               max_elements=5e6, seed=None, n_bins=4096):
+    """
+    Estimate the uncertainty in ingestion rates with a Monte Carlo simulation. n_reps perturbed replicates of all
+    inputs are drawn as arrays: chl-a with a multiplicative lognormal error (relative SD chl_cv), experiment times
+    with a normal error (SD time_sd hours), bottle volumes with a normal relative error (vol_cv) and copepod counts
+    from a Poisson distribution. The control averages, k and the Frost equations are evaluated for every bottle x
+    replicate at once, in chunks of replicates so that the perturbed inputs and intermediate arrays hold at most
+    max_elements values. The replicates aren't kept: the mean and confidence interval of each bottle and treatment
+    average are accumulated from each chunk (the interval from a histogram of n_bins bins, accurate to the bin width),
+    so memory doesn't grow with n_reps.
+    :param chla: chl-a data, normalized to the canonical columns (see functions.schema)
+    :param expt_data: experiment times, normalized to the canonical columns (see functions.schema)
+    :param n_reps: number of Monte Carlo replicates
+    :param chl_cv: relative standard deviation of the chl-a measurements
+    :param time_sd: standard deviation of the experiment times (hours)
+    :param vol_cv: relative standard deviation of the bottle volumes
+    :param ci: confidence interval (%)
+    :param max_elements: maximum number of values in each perturbed input array, the replicates are processed in
+    chunks of max_elements // (number of bottles) replicates. The random draws depend on the chunks, so results for a
+    given seed are reproducible for the same max_elements
+    :param seed: optional seed for the random number generator
+    :param n_bins: number of histogram bins used to estimate the confidence intervals
+    :returns: dataframe of ingestion rates (ug Chl/ind/day) for each bottle and dataframe of average ingestion rates
+    for each treatment (negative rates set to zero, as in the summary statistics), both with the Monte Carlo mean
+    and confidence interval
+    """
+    rng = np.random.RandomState(seed)
+    q = [(100 - ci) / 2, 100 - (100 - ci) / 2]
+    controls, control_times, bottles = experiment_arrays(chla, expt_data)
+    if len(bottles) == 0:
+        return pd.DataFrame(), pd.DataFrame()
+
+    ns = bottles['sid'].nunique()
+    bsid = bottles['sid'].values
+    nb = len(bottles)
+    t0 = controls[controls['tp'] == 't0']
+    tf = controls[controls['tp'] == 'tf']
+
+    # replicates in each chunk, limited by the largest perturbed input array
+    chunk = max(1, int(max_elements // max(nb, len(t0), len(tf), len(control_times))))
+
+    # streaming statistics of the ingestion rates of each bottle and treatment average
+    bottle_stats = _Histogram(nb, n_bins)
+    tmt_stats = _Histogram(ns, n_bins)
+    for start in range(0, n_reps, chunk):
+        n = min(chunk, n_reps - start)
+
+        # perturbed control averages, replicates x stations
+        c_avg = dict()
+        for tp, tpc in [('t0', t0), ('tf', tf)]:
+            chl = tpc['chl_ug_l'].values * np.exp(rng.normal(0, chl_cv, (n, len(tpc))))
+            c_avg[tp] = _station_average(chl, tpc['sid'].values, ns)
+        ct = control_times['expt_time_hours'].values + rng.normal(0, time_sd, (n, len(control_times)))
+        c_expt_time = _station_average(ct, control_times['sid'].values, ns)
+        k = np.log(c_avg['tf'] / c_avg['t0']) / c_expt_time
+
+        # perturbed treatment bottles, replicates x bottles
+        chl_tf = bottles['chl_ug_l'].values * np.exp(rng.normal(0, chl_cv, (n, nb)))
+        tmt_time = bottles['expt_time_hours'].values + rng.normal(0, time_sd, (n, nb))
+        vol = bottles['expt_vol_ml'].values * (1 + rng.normal(0, vol_cv, (n, nb)))
+        num_copes = rng.poisson(bottles['num_copes'].values, (n, nb)).astype(float)
+        num_copes[num_copes == 0] = np.nan
+
+        clearance_rate, ingest_rate_hour = frost_equations(c_avg['t0'][:, bsid], k[:, bsid], chl_tf, tmt_time,
+                                                           vol, num_copes)
+        ird = ingest_rate_hour * 24
+        ird[~np.isfinite(ird)] = np.nan
+        bottle_stats.update(ird)
+
+        # treatment averages for each replicate, negative ingestion rates set to zero
+        tmt_stats.update(_valid_average(np.clip(ird, 0, None), bsid, ns))
+
+    # unperturbed estimate for each bottle
+    c_t0 = t0.groupby('sid')['chl_ug_l'].mean()
+    c_tf = tf.groupby('sid')['chl_ug_l'].mean()
+    k0 = np.log(c_tf / c_t0) / control_times.groupby('sid')['expt_time_hours'].mean()
+    cr, irh = frost_equations(c_t0.reindex(bsid).values, k0.reindex(bsid).values, bottles['chl_ug_l'].values,
+                              bottles['expt_time_hours'].values, bottles['expt_vol_ml'].values,
+                              bottles['num_copes'].values)
+
+    lower, upper = bottle_stats.percentile(q)
+    bottle_summary = pd.DataFrame({'cruise': bottles['cruise'].values, 'treatment': bottles['treatment'].values,
+                                   'full_treatment': (bottles['treatment'] + '_' + bottles['bottle']).values,
+                                   'ingestion_rate (ug Chl/ind/day)': irh * 24,
+                                   'mc_mean': bottle_stats.mean(), 'ci_lower': lower,
+                                   'ci_upper': upper})
+
+    tmt_avg0 = _valid_average(np.clip(irh * 24, 0, None), bsid, ns)[0]
+
+    stations = bottles.drop_duplicates('sid').set_index('sid').sort_index()
+    lower, upper = tmt_stats.percentile(q)
+    tmt_summary = pd.DataFrame({'cruise': stations['cruise'].values, 'treatment': stations['treatment'].values,
+                                'ingestion_rate_avg (ug Chl/ind/day)': tmt_avg0,
+                                'mc_mean': tmt_stats.mean(), 'ci_lower': lower, 'ci_upper': upper})
+
+    return bottle_summary, tmt_summary
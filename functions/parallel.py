@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+@brief Run independent per-cruise (or per-experiment) processing in worker processes. Input dataframes are handed to
+the workers through memory shared with the parent process instead of being pickled for every task, and results are
+returned in the same sorted order the serial loops produce.
+"""
+
+import multiprocessing as mp
+import numpy as np
+
+# function, input dataframes and partition indices, inherited by forked worker processes
+_SHARED = dict()
+
+
+def _run_partition(key):
+    func = _SHARED['func']
+    kwargs = _SHARED['kwargs']
+    frames = dict()
+    for name, df in _SHARED['frames'].items():
+        frames[name] = df.iloc[_SHARED['partitions'][name].get(key, [])]
+    frames.update(kwargs)
+    return func(key, **frames)
+
+
+def map_partitions(func, frames, partition_col='cruise', n_jobs=1, **kwargs):
+    """
+    Split the input dataframes by the values in partition_col and call func once for each value. With n_jobs > 1 the
+    calls run in a pool of forked worker processes: the dataframes are shared with the workers through the parent's
+    memory (copy-on-write) and only the partition key is sent to each worker. Platforms that can't fork fall back to
+    serial processing.
+    :param func: function called as func(key, **frames, **kwargs) for each partition
+    :param frames: dictionary of input dataframes, each must contain partition_col
+    :param partition_col: column to partition the dataframes by, default 'cruise'
+    :param n_jobs: number of worker processes, default 1 (serial)
+    :param kwargs: additional keyword arguments passed to func
+    :returns: list of (key, result) tuples sorted by key
+    """
+    partitions = {name: df.groupby(partition_col).indices for name, df in frames.items()}
+    keys = np.unique(np.concatenate([list(p.keys()) for p in partitions.values()])).tolist()
+
+    _SHARED['func'] = func
+    _SHARED['kwargs'] = kwargs
+    _SHARED['frames'] = frames
+    _SHARED['partitions'] = partitions
+    try:
+        if n_jobs > 1 and len(keys) > 1 and 'fork' in mp.get_all_start_methods():
+            with mp.get_context('fork').Pool(min(n_jobs, len(keys))) as pool:
+                results = pool.map(_run_partition, keys, chunksize=1)
+        else:
+            results = [_run_partition(key) for key in keys]
+    finally:
+        _SHARED.clear()
+
+    return list(zip(keys, results))
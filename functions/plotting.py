@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+@brief Grouped bar charts with an optional broken y-axis. The bar geometry is calculated once and drawn on a normal
+axis and on the two panels of the broken axis, and the break limits are picked from the largest gap in the bar heights
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+
+def _nice(x, step, func):
+    # round x up (func=np.ceil) or down (func=np.floor) to a multiple of step
+    return float(func(x / step) * step)
+
+
+def find_axis_break(values, min_gap=0.4, pad=0.05):
+    """
+    Find y-axis limits for a broken axis from the largest gap in the distribution of bar heights
+    :param values: bar heights (any shape)
+    :param min_gap: minimum size of the gap as a fraction of the largest value to break the axis
+    :param pad: space added above and below the bars on either side of the break, as a fraction of the largest value
+    :returns: limits of the lower and upper panels ((0, lower_top), (upper_bottom, upper_top)), or None if there is no
+    gap large enough to break the axis
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    values = values[np.isfinite(values)]
+    if len(values) == 0 or np.any(values < 0):
+        return None
+
+    tops = np.unique(np.append(values, 0))
+    vmax = tops[-1]
+    if vmax <= 0:
+        return None
+    gaps = np.diff(tops)
+    i = np.argmax(gaps)
+    if i == 0 or gaps[i] < min_gap * vmax:
+        # no gap, or the gap is below the smallest bar and breaking the axis wouldn't make the small bars visible
+        return None
+
+    step = 10 ** np.floor(np.log10(vmax)) / 10  # round the limits to 2 significant figures
+    margin = pad * vmax
+    lower_top = _nice(tops[i] + margin, step, np.ceil)
+    upper_bottom = _nice(tops[i + 1] - margin, step, np.floor)
+    if upper_bottom <= lower_top:
+        return None
+    return (0, lower_top), (upper_bottom, _nice(vmax + margin, step, np.ceil))
+
+
+def bar_geometry(values, width=0.25):
+    """
+    Calculate the positions of grouped bars
+    :param values: list of series, each an array of bar heights with one value per group
+    :param width: width of each bar
+    :returns: dictionary with the x positions of the bars for each series (x), the bar heights (heights) and the center
+    of each group of bars (centers)
+    """
+    heights = [np.asarray(v, dtype=float) for v in values]
+    r = np.arange(len(heights[0]))
+    x = [r + i * width for i in range(len(heights))]
+    centers = r + width * (len(heights) - 1) / 2
+    return dict(x=x, heights=heights, centers=centers, width=width)
+
+
+def draw_bars(ax, geometry, labels, colors, bar_kw=None):
+    """
+    Draw grouped bars on an axis
+    :param ax: matplotlib axis
+    :param geometry: bar positions and heights (see bar_geometry)
+    :param labels: legend label for each series
+    :param colors: color of each series
+    :param bar_kw: optional dictionary of keyword arguments passed to ax.bar (e.g. edgecolor, alpha)
+    """
+    bar_kw = bar_kw or dict()
+    for x, h, lab, c in zip(geometry['x'], geometry['heights'], labels, colors):
+        ax.bar(x, h, width=geometry['width'], color=c, label=lab, **bar_kw)
+
+
+def grouped_bar_chart(values, xticklabels, labels, colors, width=0.25, ylabel=None, title=None, tick_shift=0,
+                      xtick_kw=None, legend_kw=None, bar_kw=None, ylims='auto'):
+    """
+    Create a grouped bar chart, and the same chart with a broken y-axis if the bar heights have a large gap (e.g. one
+    very abundant species). Both figures are drawn from the same bar geometry.
+    :param values: list of series, each an array of bar heights with one value per group
+    :param xticklabels: label for each group
+    :param labels: legend label for each series
+    :param colors: color of each series
+    :param width: width of each bar
+    :param ylabel: y-axis label
+    :param title: plot title
+    :param tick_shift: shift of the x-ticks from the center of each group (e.g. for rotated, right-aligned labels)
+    :param xtick_kw: optional dictionary of keyword arguments for the x-tick labels (e.g. fontsize, rotation, ha)
+    :param legend_kw: optional dictionary of keyword arguments for the legend
+    :param bar_kw: optional dictionary of keyword arguments passed to ax.bar (e.g. edgecolor, alpha)
+    :param ylims: limits of the lower and upper panels of the broken axis ((0, lower_top), (upper_bottom, upper_top)),
+    'auto' to find them from the bar heights (see find_axis_break), or None for no broken axis
+    :returns: the figure with a normal axis, and the figure with a broken axis (None if the axis isn't broken)
+    """
+    xtick_kw = xtick_kw or dict()
+    legend_kw = legend_kw or dict()
+    geometry = bar_geometry(values, width)
+    ticks = geometry['centers'] + tick_shift
+    if ylims == 'auto':
+        ylims = find_axis_break(geometry['heights'])
+
+    fig, ax = plt.subplots()
+    draw_bars(ax, geometry, labels, colors, bar_kw)
+    ax.set_xticks(ticks)
+    ax.set_xticklabels(xticklabels, **xtick_kw)
+    if ylabel:
+        ax.set_ylabel(ylabel)
+    if title:
+        ax.set_title(title)
+    ax.legend(**legend_kw)
+
+    if ylims is None:
+        return fig, None
+
+    # broken axis: upper panel on top, panel heights proportional to the range of each panel
+    (lower, upper) = ylims
+    bfig = plt.figure()
+    top, bottom = bfig.subplots(2, 1, sharex=True, gridspec_kw=dict(hspace=0.1, height_ratios=[upper[1] - upper[0],
+                                                                                                 lower[1] - lower[0]]))
+    for bax, lims in [(top, upper), (bottom, lower)]:
+        draw_bars(bax, geometry, labels, colors, bar_kw)
+        bax.set_ylim(lims)
+    top.spines['bottom'].set_visible(False)
+    bottom.spines['top'].set_visible(False)
+    top.tick_params(axis='x', bottom=False, labelbottom=False)
+    bottom.set_xticks(ticks)
+    bottom.set_xticklabels(xticklabels, **xtick_kw)
+
+    # diagonal break marks at the ends of the broken spines
+    marks = dict(marker=[(-1, -0.5), (1, 0.5)], markersize=10, linestyle='none', color='k', mec='k', mew=1,
+                 clip_on=False)
+    top.plot([0, 1], [0, 0], transform=top.transAxes, **marks)
+    bottom.plot([0, 1], [1, 1], transform=bottom.transAxes, **marks)
+
+    if ylabel:
+        bfig.text(0.02, 0.5, ylabel, rotation='vertical', va='center')
+    if title:
+        top.set_title(title)
+    broken_legend_kw = dict(loc=2)
+    broken_legend_kw.update(legend_kw)
+    top.legend(**broken_legend_kw)
+
+    return fig, bfig
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+@brief Write summary tables (e.g. per-bottle rates and per-treatment statistics) as separate typed tables, so each
+section can be loaded on its own without parsing a mixed file
+"""
+
+import os
+import pandas as pd
+
+OUTPUT_FORMATS = ['csv', 'parquet', 'xlsx']
+
+
+def typed_table(rows, dtypes):
+    """
+    Build a typed dataframe from a list of rows
+    :param rows: list of rows, each a list of values in the same order as dtypes
+    :param dtypes: ordered dictionary of column names and dtypes
+    :returns: dataframe with the columns cast to the dtypes
+    """
+    df = pd.DataFrame(rows, columns=list(dtypes.keys()))
+    return df.astype(dtypes)
+
+
+def write_tables(tables, fname, fmt='csv'):
+    """
+    Write summary tables to file. csv and parquet write one file per table named <fname>_<table name>.<fmt>, xlsx
+    writes one workbook <fname>.xlsx with one sheet per table.
+    :param tables: ordered dictionary of table name and dataframe
+    :param fname: output file path without the extension
+    :param fmt: output format (options: csv, parquet, xlsx). parquet requires pyarrow (see environment.yml)
+    :returns: list of files written
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError('Output format {} not supported, options: {}'.format(fmt, OUTPUT_FORMATS))
+
+    files = []
+    if fmt == 'xlsx':
+        sfile = '{}.xlsx'.format(fname)
+        with pd.ExcelWriter(sfile) as writer:
+            for name, df in tables.items():
+                df.to_excel(writer, sheet_name=name, index=False)
+        files.append(sfile)
+    else:
+        for name, df in tables.items():
+            sfile = '{}_{}.{}'.format(fname, name, fmt)
+            if fmt == 'csv':
+                df.to_csv(sfile, index=False)
+            else:
+                df.reset_index(drop=True).to_parquet(sfile, engine='pyarrow')  # default index isn't written
+            files.append(sfile)
+
+    return [os.path.abspath(sf) for sf in files]
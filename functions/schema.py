@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+@brief Registry of the known data sheet layouts. Each layout maps the column names used in a sheet to canonical
+column names and dtypes, so sheets are normalized once at load time and downstream code only deals with one
+canonical, typed dataframe.
+"""
+
+import pandas as pd
+
+# chl-a data from grazing experiments
+CHLA_DTYPES = {'cruise': str, 'treatment': str, 'bottle': str, 'time_point': str, 'chl_ug_l': float,
+               'expt_vol_ml': float, 'num_copes': float}
+
+# experiment start and end times
+EXPT_DATA_DTYPES = {'cruise': str, 'treatment': str, 'bottle': str, 'expt_time_hours': float}
+
+LAYOUTS = {
+    'chla_station': dict(sheet='chla', dtypes=CHLA_DTYPES,
+                         columns={'Cruise': 'cruise', 'Station': 'treatment', 'Bottle': 'bottle',
+                                  'Time Point': 'time_point', 'Chl (ug/l)': 'chl_ug_l', 'expt_vol_ml': 'expt_vol_ml',
+                                  'num_copes': 'num_copes'}),
+    'chla_treatment': dict(sheet='chla', dtypes=CHLA_DTYPES,
+                           columns={'Cruise': 'cruise', 'Treatment': 'treatment', 'Bottle': 'bottle',
+                                    'Time Point': 'time_point', 'Chl (ug/l)': 'chl_ug_l',
+                                    'expt_vol_ml': 'expt_vol_ml', 'num_copes': 'num_copes'}),
+    'expt_data_station': dict(sheet='expt_data', dtypes=EXPT_DATA_DTYPES,
+                              columns={'cruise': 'cruise', 'station': 'treatment', 'bottle': 'bottle',
+                                       'expt_time_hours': 'expt_time_hours'}),
+    'expt_data_treatment': dict(sheet='expt_data', dtypes=EXPT_DATA_DTYPES,
+                                columns={'cruise': 'cruise', 'treatment': 'treatment', 'bottle': 'bottle',
+                                         'expt_time_hours': 'expt_time_hours'})
+}
+
+
+def detect_layout(df, sheet_name):
+    """
+    Find the registered layout that matches the columns of a sheet
+    :param df: dataframe read from the sheet
+    :param sheet_name: name of the sheet
+    :returns: name of the matching layout
+    """
+    columns = set(df.columns)
+    for name, layout in LAYOUTS.items():
+        if layout['sheet'] == sheet_name and set(layout['columns']).issubset(columns):
+            return name
+    raise ValueError('No registered layout for sheet {} with columns {}'.format(sheet_name, df.columns.tolist()))
+
+
+def normalize(df, sheet_name, layout=None):
+    """
+    Rename the columns of a sheet to the canonical column names and cast them to the canonical dtypes. Columns that
+    aren't part of the layout are kept unchanged.
+    :param df: dataframe read from the sheet
+    :param sheet_name: name of the sheet
+    :param layout: optional layout name, detected from the columns if not provided
+    :returns: normalized dataframe
+    """
+    layout = LAYOUTS[layout or detect_layout(df, sheet_name)]
+    df = df.rename(columns=layout['columns'])
+    return df.astype(layout['dtypes'])
+
+
+def load_sheet(f, sheet_name, layout=None):
+    """
+    Read a sheet from an Excel file and normalize it to the canonical column names and dtypes
+    :param f: Excel file
+    :param sheet_name: name of the sheet
+    :param layout: optional layout name, detected from the columns if not provided
+    :returns: normalized dataframe
+    """
+    df = pd.read_excel(f, sheet_name=sheet_name)
+    return normalize(df, sheet_name, layout)
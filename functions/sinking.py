@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+@brief Functions to calculate zooplankton fecal pellet sinking rates from settling-column timings, summarize them by
+cruise and treatment, and test for differences between treatments
+"""
+
+import numpy as np
+from scipy import stats
+from statsmodels.stats.multicomp import pairwise_tukeyhsd
+
+
+def calculate_sinking_rates(df, group_cols=None, pellet_col='pellet_id', distance_col='distance_cm',
+                            time_col='time_sec'):
+    """
+    Calculate fecal pellet sinking rates from raw settling-column timings. If a pellet was timed over multiple
+    intervals, the rate is the total distance divided by the total time.
+    :param df: dataframe with one row per pellet (or pellet interval) containing the distance travelled and the time
+    :param group_cols: columns identifying the experiment a pellet belongs to, default ['cruise', 'station']
+    :param pellet_col: column identifying the pellet
+    :param distance_col: column containing the distance the pellet sank in cm
+    :param time_col: column containing the time it took the pellet to sink that distance in seconds
+    :returns: dataframe with one row per pellet and columns distance_cm, time_sec and sinking_rate_m_day
+    """
+    group_cols = group_cols or ['cruise', 'station']
+    pellets = df.groupby(group_cols + [pellet_col])[[distance_col, time_col]].sum().reset_index()
+
+    # cm/sec to m/day
+    rates = (pellets[distance_col] / 100) / (pellets[time_col] / 86400)
+    pellets['sinking_rate_m_day'] = rates.where(pellets[time_col] > 0, np.nan)
+    return pellets
+
+
+def summarize_sinking_rates(df, group_cols=None, value_col='sinking_rate_m_day'):
+    """
+    Calculate the average, standard deviation and number of sinking rates for each cruise and treatment
+    :param df: dataframe containing sinking rates (see calculate_sinking_rates)
+    :param group_cols: columns to group by, default ['cruise', 'station']
+    :param value_col: column containing the sinking rates
+    :returns: dataframe with one row per group and columns avg, stdev and n
+    """
+    group_cols = group_cols or ['cruise', 'station']
+    summary = df.groupby(group_cols)[value_col].agg(['mean', 'std', 'count']).reset_index()
+    summary.rename(columns={'mean': 'avg', 'std': 'stdev', 'count': 'n'}, inplace=True)
+    return summary
+
+
+def compare_treatments(df, group_col, value_col='sinking_rate_m_day', alpha=0.05):
+    """
+    Test for differences between treatments. Two treatments are compared with Student's t-test, more than two with a
+    one-way ANOVA followed by a Tukey HSD pairwise comparison.
+    :param df: dataframe containing the data for one cruise
+    :param group_col: column identifying the treatment
+    :param value_col: column containing the values to compare
+    :param alpha: significance level for the Tukey HSD pairwise comparison
+    :returns: dictionary with the test name, test statistic, p-value and (for ANOVA) the Tukey HSD results. Returns
+    None if there are fewer than two treatments
+    """
+    df = df.dropna(subset=[value_col])
+    groups = [g[value_col].values for name, g in df.groupby(group_col)]
+    if len(groups) < 2:
+        return None
+    elif len(groups) == 2:
+        statistic, pvalue = stats.ttest_ind(groups[0], groups[1])
+        return dict(test='t-test', statistic=statistic, pvalue=pvalue, tukey=None)
+    else:
+        statistic, pvalue = stats.f_oneway(*groups)
+        tukey = pairwise_tukeyhsd(endog=df[value_col], groups=df[group_col], alpha=alpha)
+        return dict(test='ANOVA', statistic=statistic, pvalue=pvalue, tukey=tukey)
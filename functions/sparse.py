@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+@brief Sparse storage for taxon-by-tow (or taxon-by-station) zooplankton abundance. Only nonzero abundances are
+stored, so memory and aggregation cost scale with the number of observations rather than tows x taxa. Dense
+dataframes are only created for the rows being plotted.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class SparseAbundance(object):
+    """
+    Abundance matrix (rows = tows or stations, columns = taxa) stored in compressed sparse row format, with optional
+    taxon groups (e.g. the 'type' of each species) used for rollups
+    """
+    def __init__(self, matrix, rows, taxa, taxon_groups=None):
+        """
+        :param matrix: scipy sparse matrix of abundance, rows x taxa
+        :param rows: row labels (tows or stations)
+        :param taxa: column labels (taxa)
+        :param taxon_groups: optional list of the group each taxon belongs to
+        """
+        self.matrix = sparse.csr_matrix(matrix)
+        self.rows = pd.Index(rows)
+        self.taxa = pd.Index(taxa)
+        if taxon_groups is not None:
+            taxon_groups = pd.Series(list(taxon_groups), index=self.taxa)
+        self.taxon_groups = taxon_groups
+
+    @classmethod
+    def from_long(cls, df, row_col, taxon_col, value_col='abundance_count_per_m3', group_col=None):
+        """
+        Build from a long-form dataframe with one row per tow/station and taxon. Zero and missing abundances are
+        dropped and duplicate row/taxon entries are summed.
+        :param df: long-form dataframe
+        :param row_col: column containing the row labels, e.g. 'station' or 'Tow'
+        :param taxon_col: column containing the taxa, e.g. 'species'
+        :param value_col: column containing the abundance
+        :param group_col: optional column containing the group each taxon belongs to, e.g. 'type'
+        """
+        rows, row_idx = np.unique(df[row_col].values, return_inverse=True)
+        taxa, taxon_idx = np.unique(df[taxon_col].values, return_inverse=True)
+        values = df[value_col].values.astype(float)
+        keep = np.nan_to_num(values) != 0
+
+        matrix = sparse.coo_matrix((values[keep], (row_idx[keep], taxon_idx[keep])), shape=(len(rows), len(taxa)))
+
+        taxon_groups = None
+        if group_col is not None:
+            groups = df.drop_duplicates(subset=[taxon_col]).set_index(taxon_col)[group_col]
+            taxon_groups = groups.reindex(taxa).values
+        return cls(matrix.tocsr(), rows, taxa, taxon_groups)
+
+    @classmethod
+    def from_wide(cls, df, id_col, taxon_groups=None):
+        """
+        Build from a wide dataframe with one row per tow/station and one column per taxon (e.g. the Ross Sea
+        abundance sheets), without melting it to long form
+        :param df: wide dataframe
+        :param id_col: column containing the row labels, e.g. 'Tow'
+        :param taxon_groups: optional dictionary of taxon: group
+        """
+        taxa = [c for c in df.columns if c != id_col]
+        values = np.nan_to_num(df[taxa].values.astype(float))
+        row_idx, taxon_idx = np.nonzero(values)
+        matrix = sparse.coo_matrix((values[row_idx, taxon_idx], (row_idx, taxon_idx)), shape=values.shape)
+        groups = None
+        if taxon_groups is not None:
+            groups = [taxon_groups.get(t) for t in taxa]
+        return cls(matrix.tocsr(), df[id_col].values, taxa, groups)
+
+    @property
+    def density(self):
+        """
+        Fraction of the tow x taxon entries that are nonzero
+        """
+        return self.matrix.nnz / float(np.prod(self.matrix.shape))
+
+    def totals(self):
+        """
+        Total abundance for each row
+        :returns: series indexed by the row labels
+        """
+        return pd.Series(np.asarray(self.matrix.sum(axis=1)).ravel(), index=self.rows)
+
+    def rollup(self):
+        """
+        Sum the abundance of all taxa in each taxon group, equivalent to groupby([row, group]).sum()
+        :returns: SparseAbundance with the groups as columns
+        """
+        if self.taxon_groups is None:
+            raise ValueError('Taxon groups are required for a rollup')
+        groups, group_idx = np.unique(self.taxon_groups.values.astype(str), return_inverse=True)
+        indicator = sparse.csr_matrix((np.ones(len(group_idx)), (np.arange(len(group_idx)), group_idx)),
+                                      shape=(len(group_idx), len(groups)))
+        return SparseAbundance(self.matrix @ indicator, self.rows, groups)
+
+    def select(self, rows):
+        """
+        Subset the rows
+        :param rows: list of row labels, in the order they should be returned
+        :returns: SparseAbundance containing only the selected rows
+        """
+        idx = self.rows.get_indexer(rows)
+        if np.any(idx < 0):
+            raise KeyError('Rows not found: {}'.format(list(np.asarray(rows)[idx < 0])))
+        groups = None
+        if self.taxon_groups is not None:
+            groups = self.taxon_groups.values
+        return SparseAbundance(self.matrix[idx], self.rows[idx], self.taxa, groups)
+
+    def to_dense(self, rows=None):
+        """
+        Export a dense rows x taxa dataframe, only for the rows requested
+        :param rows: optional list of row labels, default is all rows
+        """
+        sa = self if rows is None else self.select(rows)
+        return pd.DataFrame(sa.matrix.toarray(), index=sa.rows, columns=sa.taxa)
+
+    def to_long(self, rows=None, row_name='station', taxon_name='species', value_name='abundance_count_per_m3'):
+        """
+        Export a long-form dataframe (including zeros) for plotting, only for the rows requested. Rows are ordered by
+        taxon, then by row, like the output of pd.melt
+        :param rows: optional list of row labels, default is all rows
+        :param row_name: name of the row label column
+        :param taxon_name: name of the taxon column
+        :param value_name: name of the abundance column
+        """
+        dense = self.to_dense(rows)
+        n_rows, n_taxa = dense.shape
+        return pd.DataFrame({row_name: np.tile(dense.index.values, n_taxa),
+                             taxon_name: np.repeat(dense.columns.values, n_rows),
+                             value_name: dense.values.T.ravel()})
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+@brief Time series of processed results (e.g. ingestion rates, sinking rates, abundance) by station and cruise. Each
+processed input is reduced to sufficient statistics (n, sum and sum of squares of the values for each variable, station
+and cruise) and saved to its own file in a history directory. Adding a cruise only calculates and writes the statistics
+for that input, and resampled (seasonal, annual) and rolling statistics are combined from the stored statistics
+without going back to the full history of raw values.
+"""
+
+import glob
+import os
+import re
+import numpy as np
+import pandas as pd
+
+STAT_KEYS = ['variable', 'station', 'cruise', 'date', 'source']
+STAT_COLUMNS = ['n', 'sum', 'sumsq']
+
+# month and day used for cruises named by season and year, e.g. Fall2019
+SEASONS = {'winter': (1, 15), 'spring': (4, 15), 'summer': (7, 15), 'fall': (10, 15), 'autumn': (10, 15)}
+
+
+def cruise_date(cruise):
+    """
+    Date of a cruise from its name: season and year (e.g. Fall2019, Spring 2020 -> mid-season date), or any date
+    string pandas can parse
+    :param cruise: cruise name
+    :returns: pandas Timestamp
+    """
+    match = re.search(r'(winter|spring|summer|fall|autumn)[\s_-]*(\d{4})', str(cruise), re.IGNORECASE)
+    if match:
+        month, day = SEASONS[match.group(1).lower()]
+        return pd.Timestamp(int(match.group(2)), month, day)
+    try:
+        return pd.Timestamp(cruise)
+    except ValueError:
+        raise ValueError('Cannot determine the date of cruise {}, provide the cruise dates'.format(cruise))
+
+
+def season(dates):
+    """
+    Season of each date (winter = Dec-Feb, spring = Mar-May, summer = Jun-Aug, fall = Sep-Nov)
+    :param dates: series of dates
+    :returns: array of season names
+    """
+    names = np.array(['winter', 'winter', 'spring', 'spring', 'spring', 'summer', 'summer', 'summer', 'fall', 'fall',
+                      'fall', 'winter'])
+    return names[pd.to_datetime(dates).dt.month.values - 1]
+
+
+def sufficient_stats(df, variable, value_col, source, station_col='treatment', cruise_col='cruise', dates=None):
+    """
+    Reduce processed results to the number, sum and sum of squares of the values for each station and cruise
+    :param df: dataframe of processed results, one row per value (e.g. per bottle, pellet or tow)
+    :param variable: name of the variable, e.g. 'ingestion_rate_ug_chl_ind_day'
+    :param value_col: column containing the values
+    :param source: name of the input the results came from, e.g. the input file name. Statistics from the same
+    source replace the previous statistics when they are added to the history
+    :param station_col: column containing the station or treatment
+    :param cruise_col: column containing the cruise
+    :param dates: optional dictionary of cruise: date, default is to determine the date from the cruise name
+    :returns: dataframe of sufficient statistics with columns STAT_KEYS + STAT_COLUMNS
+    """
+    values = df[[cruise_col, station_col, value_col]].dropna(subset=[value_col])
+    values = values.rename(columns={cruise_col: 'cruise', station_col: 'station', value_col: 'value'})
+    values['sq'] = values['value'] ** 2
+    grouped = values.groupby(['cruise', 'station'])
+    stats = pd.DataFrame({'n': grouped['value'].size(), 'sum': grouped['value'].sum(),
+                          'sumsq': grouped['sq'].sum()}).reset_index()
+    dates = dates or dict()
+    stats['date'] = [pd.Timestamp(dates[c]) if c in dates else cruise_date(c) for c in stats['cruise']]
+    stats['variable'] = variable
+    stats['source'] = source
+    return stats[STAT_KEYS + STAT_COLUMNS]
+
+
+def _stats_file(history_dir, variable, source):
+    return os.path.join(history_dir, '{}__{}.csv'.format(variable, source))
+
+
+def append_history(history_dir, stats):
+    """
+    Add sufficient statistics to a history directory, one file for each variable and source. Existing statistics for
+    the same variable and source (e.g. an input that was processed again) are replaced, other files aren't read.
+    :param history_dir: history directory, created if it doesn't exist
+    :param stats: dataframe of sufficient statistics (see sufficient_stats)
+    :returns: list of files written
+    """
+    os.makedirs(history_dir, exist_ok=True)
+    files = []
+    for (variable, source), s in stats.groupby(['variable', 'source']):
+        sfile = _stats_file(history_dir, variable, source)
+        s.to_csv(sfile, index=False)
+        files.append(sfile)
+    return files
+
+
+def load_history(history_dir, variables=None):
+    """
+    Load the sufficient statistics from a history directory
+    :param history_dir: history directory
+    :param variables: optional list of variables to load, default is all variables
+    :returns: dataframe of sufficient statistics (see sufficient_stats)
+    """
+    files = sorted(glob.glob(os.path.join(history_dir, '*__*.csv')))
+    if variables is not None:
+        files = [f for f in files if os.path.basename(f).split('__')[0] in variables]
+    if len(files) == 0:
+        return pd.DataFrame(columns=STAT_KEYS + STAT_COLUMNS)
+    stats = pd.concat([pd.read_csv(f, dtype={'station': str, 'cruise': str, 'source': str}) for f in files],
+                      ignore_index=True)
+    stats['date'] = pd.to_datetime(stats['date'])
+    return stats
+
+
+def _finalize(stats):
+    # mean, standard deviation (ddof=1) and n from summed sufficient statistics
+    n = stats['n'].astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = stats['sum'] / n
+        var = (stats['sumsq'] - n * mean ** 2) / (n - 1)
+    stats = stats.drop(columns=STAT_COLUMNS)
+    stats['mean'] = mean
+    stats['stdev'] = np.sqrt(np.clip(var, 0, None)).where(n > 1)
+    stats['n'] = n.astype(int)
+    return stats
+
+
+def _combine(stats, keys):
+    return stats.groupby(keys)[STAT_COLUMNS].sum().reset_index()
+
+
+def cruise_summary(stats):
+    """
+    Mean, standard deviation and n of each variable for each station and cruise, combining all sources
+    :param stats: dataframe of sufficient statistics (see sufficient_stats, load_history)
+    :returns: dataframe sorted by variable, station and date
+    """
+    summary = _combine(stats, ['variable', 'station', 'date', 'cruise'])
+    return _finalize(summary).sort_values(by=['variable', 'station', 'date']).reset_index(drop=True)
+
+
+def resample_stats(stats, freq='Y'):
+    """
+    Combine the cruises in each period for each variable and station
+    :param stats: dataframe of sufficient statistics (see sufficient_stats, load_history)
+    :param freq: pandas period frequency, e.g. 'Y' (annual) or 'Q' (quarterly), or 'season' to combine each season
+    across all years (seasonal climatology)
+    :returns: dataframe with columns variable, station, period, n_cruises, n, mean and stdev
+    """
+    stats = stats.copy()
+    if freq == 'season':
+        stats['period'] = season(stats['date'])
+    else:
+        stats['period'] = pd.to_datetime(stats['date']).dt.to_period(freq).astype(str)
+    keys = ['variable', 'station', 'period']
+    summary = _combine(stats, keys)
+    summary['n_cruises'] = stats.groupby(keys)['cruise'].nunique().values
+    summary = _finalize(summary)
+    return summary[keys + ['n_cruises', 'n', 'mean', 'stdev']]
+
+
+def rolling_stats(stats, window=3):
+    """
+    Rolling statistics over the most recent cruises for each variable and station, calculated from cumulative sums of
+    the sufficient statistics
+    :param stats: dataframe of sufficient statistics (see sufficient_stats, load_history)
+    :param window: number of cruises in each window, ending at each cruise
+    :returns: dataframe with columns variable, station, date, cruise, n_cruises, n, mean and stdev
+    """
+    keys = ['variable', 'station']
+    summary = _combine(stats, keys + ['date', 'cruise']).sort_values(by=keys + ['date']).reset_index(drop=True)
+    summary['n_cruises'] = 1
+    grouped = summary.groupby(keys)
+    for col in STAT_COLUMNS + ['n_cruises']:
+        cs = grouped[col].cumsum()
+        summary[col] = cs - cs.groupby([summary[k] for k in keys]).shift(window).fillna(0)
+    summary = _finalize(summary)
+    summary['n_cruises'] = summary['n_cruises'].astype(int)
+    return summary[keys + ['date', 'cruise', 'n_cruises', 'n', 'mean', 'stdev']]
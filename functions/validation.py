@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+@brief Validate data sheets before any rates are calculated or figures are made. Every check runs on the whole sheet
+at once and all problems are collected into one report, instead of stopping at the first bad bottle mid-run.
+Errors are problems that would stop the analysis or give NaN/inf results, warnings are values that will be used but
+should be checked (e.g. negative ingestion rates that are set to zero).
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from functions.grazing import time_point_labels
+from functions.schema import load_sheet
+
+ISSUE_COLUMNS = ['sheet', 'check', 'level', 'cruise', 'treatment', 'id', 'message']
+
+
+def _issues(rows, sheet, check, message, level='error', id_col='bottle', treatment_col='treatment'):
+    # one issue for each row that failed a check. message is a string or a series aligned with rows
+    if id_col in rows.columns:
+        ids = rows[id_col].astype(str).values
+    else:
+        ids = np.full(len(rows), '', dtype=object)
+    if isinstance(message, pd.Series):
+        message = message.values
+    issues = pd.DataFrame({'cruise': rows['cruise'].values, 'treatment': rows[treatment_col].values, 'id': ids})
+    issues['sheet'] = sheet
+    issues['check'] = check
+    issues['level'] = level
+    issues['message'] = message
+    return issues[ISSUE_COLUMNS]
+
+
+def _nonpositive(df, col):
+    # rows where a value is missing, zero or negative
+    return df[~(df[col] > 0)]
+
+
+def _values(rows, col, label=None):
+    return (label or col) + ' = ' + rows[col].astype(str)
+
+
+def validate_grazing(chla, expt_data):
+    """
+    Check the chl-a and experiment time sheets from grazing experiments for: time points that aren't t0 or tf,
+    duplicate bottles, nonpositive chl-a and experiment times, zero copepod counts and nonpositive bottle volumes,
+    stations without control bottles at t0 and tf, control bottles without both t0 and tf chl-a, treatment bottles
+    without a tf chl-a, bottles missing from either sheet, and treatment bottles that will give a negative ingestion
+    rate (set to zero in the summary statistics)
+    :param chla: chl-a data, normalized to the canonical columns (see functions.schema)
+    :param expt_data: experiment times, normalized to the canonical columns (see functions.schema)
+    :returns: dataframe of issues, one row per problem (empty if the data are valid)
+    """
+    keys = ['cruise', 'treatment']
+    chla = chla.assign(tp=time_point_labels(chla['time_point']), is_control=chla['bottle'].str.contains('control'),
+                       is_treatment=chla['bottle'].str.contains('treatment'))
+    expt_data = expt_data.assign(is_control=expt_data['bottle'].str.contains('control'))
+    issues = []
+
+    # values
+    rows = chla[chla['tp'] == '']
+    issues.append(_issues(rows, 'chla', 'time_point', 'time point ' + rows['time_point'] + ' is not t0 or tf'))
+    rows = _nonpositive(chla, 'chl_ug_l')
+    issues.append(_issues(rows, 'chla', 'nonpositive_chl', _values(rows, 'chl_ug_l') + ' at ' + rows['time_point']))
+    rows = _nonpositive(expt_data, 'expt_time_hours')
+    issues.append(_issues(rows, 'expt_data', 'nonpositive_time', _values(rows, 'expt_time_hours')))
+    treatments = chla[chla['is_treatment']]
+    rows = _nonpositive(treatments, 'num_copes')
+    issues.append(_issues(rows, 'chla', 'zero_count', _values(rows, 'num_copes')))
+    rows = _nonpositive(treatments, 'expt_vol_ml')
+    issues.append(_issues(rows, 'chla', 'nonpositive_volume', _values(rows, 'expt_vol_ml')))
+
+    # duplicate bottles
+    rows = chla[chla.duplicated(subset=keys + ['bottle', 'time_point'], keep=False)]
+    issues.append(_issues(rows, 'chla', 'duplicate_bottle', 'bottle entered more than once at ' + rows['time_point']))
+    rows = expt_data[expt_data.duplicated(subset=keys + ['bottle'], keep=False)]
+    issues.append(_issues(rows, 'expt_data', 'duplicate_bottle', 'bottle entered more than once'))
+
+    # control bottles at t0 and tf for each station
+    stations = chla[keys].drop_duplicates()
+    n_controls = chla[chla['is_control']].groupby(keys + ['tp']).size().unstack(fill_value=0)
+    n_controls = n_controls.reindex(columns=['t0', 'tf'], fill_value=0)
+    n_controls = stations.merge(n_controls.reset_index(), on=keys, how='left').fillna(0)
+    for tp in ['t0', 'tf']:
+        rows = n_controls[n_controls[tp] == 0]
+        issues.append(_issues(rows, 'chla', 'missing_controls', 'no control bottles at {}'.format(tp)))
+    control_times = expt_data[expt_data['is_control']][keys].drop_duplicates()
+    rows = stations.merge(control_times, on=keys, how='left', indicator=True)
+    rows = rows[rows['_merge'] == 'left_only']
+    issues.append(_issues(rows, 'expt_data', 'missing_controls', 'no experiment times for the control bottles'))
+
+    # t0/tf mismatches: controls need both t0 and tf, treatments only tf
+    bottle_tps = chla[chla['tp'] != ''].groupby(keys + ['bottle', 'is_control', 'is_treatment'])['tp']
+    bottle_tps = bottle_tps.agg(lambda x: ','.join(sorted(set(x)))).reset_index()
+    rows = bottle_tps[bottle_tps['is_control'] & (bottle_tps['tp'] != 't0,tf')]
+    issues.append(_issues(rows, 'chla', 't0_tf_mismatch', 'control bottle has chl-a at ' + rows['tp'] +
+                          ' only, need t0 and tf'))
+    rows = bottle_tps[bottle_tps['is_treatment'] & (bottle_tps['tp'] != 'tf')]
+    issues.append(_issues(rows, 'chla', 't0_tf_mismatch', 'treatment bottle has chl-a at ' + rows['tp'] +
+                          ', need tf only'))
+
+    # bottles in one sheet but not the other
+    bottles = chla[keys + ['bottle', 'is_treatment']].drop_duplicates(subset=keys + ['bottle'])
+    timed = expt_data[keys + ['bottle']].drop_duplicates()
+    merged = bottles.merge(timed, on=keys + ['bottle'], how='outer', indicator=True)
+    rows = merged[(merged['_merge'] == 'left_only') & merged['is_treatment'].eq(True)]
+    issues.append(_issues(rows, 'expt_data', 'missing_time', 'no experiment time for treatment bottle'))
+    rows = merged[(merged['_merge'] == 'left_only') & ~merged['is_treatment'].eq(True)]
+    issues.append(_issues(rows, 'expt_data', 'missing_time', 'no experiment time for control bottle', level='warning'))
+    rows = merged[merged['_merge'] == 'right_only']
+    issues.append(_issues(rows, 'chla', 'missing_chl', 'experiment time but no chl-a data', level='warning'))
+
+    # negative ingestion rates: the treatment bottle chl-a grew faster than the controls (g < 0)
+    c_avg = chla[chla['is_control']].groupby(keys + ['tp'])['chl_ug_l'].mean().unstack()
+    c_avg = c_avg.reindex(columns=['t0', 'tf'])
+    c_time = expt_data[expt_data['is_control']].groupby(keys)['expt_time_hours'].mean().rename('c_time')
+    tmt = treatments[treatments['tp'] == 'tf'].merge(c_avg.reset_index(), on=keys, how='left')
+    tmt = tmt.merge(c_time.reset_index(), on=keys, how='left')
+    tmt = tmt.merge(expt_data.drop_duplicates(subset=keys + ['bottle'])[keys + ['bottle', 'expt_time_hours']],
+                    on=keys + ['bottle'], how='left')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.log(tmt['tf'] / tmt['t0']) / tmt['c_time']
+        g = k - np.log(tmt['chl_ug_l'] / tmt['t0']) / tmt['expt_time_hours']
+    rows = tmt[g < 0]
+    issues.append(_issues(rows, 'chla', 'negative_ingestion', 'ingestion rate is negative and will be set to 0 in '
+                                                              'the summary statistics', level='warning'))
+
+    return pd.concat(issues, ignore_index=True)
+
+
+def validate_sinking(df, group_cols=None, pellet_col='pellet_id', distance_col='distance_cm', time_col='time_sec'):
+    """
+    Check fecal pellet sinking data for missing or nonpositive distances and times, or for nonpositive sinking rates
+    if the rates have already been calculated
+    :param df: dataframe from the FP sheet
+    :param group_cols: columns identifying the experiment a pellet belongs to, default ['cruise', 'station']
+    :param pellet_col: column identifying the pellet
+    :param distance_col: column containing the distance the pellet sank in cm
+    :param time_col: column containing the time it took the pellet to sink that distance in seconds
+    :returns: dataframe of issues, one row per problem (empty if the data are valid)
+    """
+    group_cols = group_cols or ['cruise', 'station']
+    issues = []
+    if 'sinking_rate_m_day' in df.columns:
+        checks = [('sinking_rate_m_day', 'nonpositive_rate')]
+    else:
+        checks = [(distance_col, 'nonpositive_distance'), (time_col, 'nonpositive_time')]
+    for col, check in checks:
+        rows = _nonpositive(df, col)
+        issues.append(_issues(rows, 'FP', check, _values(rows, col), id_col=pellet_col, treatment_col=group_cols[1]))
+    return pd.concat(issues, ignore_index=True)
+
+
+def validate_file(f):
+    """
+    Validate all of the known sheets in an Excel file: chl-a and experiment times from grazing experiments, and fecal
+    pellet sinking data
+    :param f: Excel file
+    :returns: dataframe of issues, one row per problem (empty if the data are valid)
+    """
+    sheets = pd.ExcelFile(f).sheet_names
+    issues = [pd.DataFrame(columns=ISSUE_COLUMNS)]
+    if 'chla' in sheets and 'expt_data' in sheets:
+        issues.append(validate_grazing(load_sheet(f, 'chla'), load_sheet(f, 'expt_data')))
+    if 'FP' in sheets:
+        issues.append(validate_sinking(pd.read_excel(f, sheet_name='FP')))
+    return pd.concat(issues, ignore_index=True)
+
+
+def format_report(issues):
+    """
+    Format a validation report
+    :param issues: dataframe of issues (see validate_grazing, validate_sinking)
+    :returns: report as a string, with the number of errors and warnings followed by every issue
+    """
+    n_errors = int(np.sum(issues['level'] == 'error'))
+    n_warnings = int(np.sum(issues['level'] == 'warning'))
+    report = ['Validation: {} errors, {} warnings'.format(n_errors, n_warnings)]
+    if len(issues) > 0:
+        issues = issues.sort_values(by=['level', 'sheet', 'check', 'cruise', 'treatment', 'id'], kind='mergesort')
+        report.append(issues.to_string(index=False))
+    return '\n'.join(report)
+
+
+def check(issues, fname, report_file=None):
+    """
+    Print the validation report and stop if there are any errors
+    :param issues: dataframe of issues (see validate_grazing, validate_sinking)
+    :param fname: name of the file that was validated, used in the error message
+    :param report_file: optional csv file to write the issues to
+    :returns: issues
+    """
+    if report_file:
+        issues.to_csv(report_file, index=False)
+    if len(issues) > 0:
+        print(format_report(issues))
+    n_errors = int(np.sum(issues['level'] == 'error'))
+    if n_errors > 0:
+        raise ValueError('{} errors in {}, see the validation report'.format(n_errors, os.path.basename(fname)))
+    return issues
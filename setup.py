@@ -3,9 +3,10 @@ from setuptools import setup, find_packages
 setup(
     name='zooplankton-tools',
     version='1.0',
-    packages=find_packages(),
+    packages=find_packages(exclude=['tests']),
     url='https://github.com/lgarzio/zooplankton-tools',
     author='Lori Garzio',
     author_email='lgarzio@marine.rutgers.edu',
-    description='A collection of tools for analyzing zooplankton data.'
+    description='A collection of tools for analyzing zooplankton data.',
+    entry_points={'console_scripts': ['zooplankton-tools=functions.cli:main']}
 )
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+@brief pytest configuration for the golden-output tests. Outputs calculated from the fixture workbooks
+(tests/fixtures.py) are compared to the golden outputs in tests/golden: tables with array-level tolerances and figures
+by pixel comparison. Run with --update-golden to regenerate the golden outputs after an intended change in results.
+"""
+
+import os
+import re
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+from matplotlib.testing.compare import compare_images
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), 'golden')
+NUMBER = re.compile(r'-?\d+\.?\d*(?:[eE][-+]?\d+)?')
+
+
+def pytest_addoption(parser):
+    parser.addoption('--update-golden', action='store_true', help='Overwrite the golden outputs with the test outputs')
+
+
+class Golden(object):
+    """
+    Compare test outputs to the golden outputs, or overwrite the golden outputs if update is True
+    """
+    def __init__(self, tmpdir, update=False):
+        """
+        :param tmpdir: directory for outputs that aren't already files
+        :param update: overwrite the golden outputs with the test outputs
+        """
+        self.tmpdir = str(tmpdir)
+        self.update = update
+
+    def _golden(self, name, actual_file):
+        golden_file = os.path.join(GOLDEN_DIR, name)
+        if self.update:
+            os.makedirs(GOLDEN_DIR, exist_ok=True)
+            shutil.copyfile(actual_file, golden_file)
+        elif not os.path.isfile(golden_file):
+            pytest.fail('Golden output {} not found, run pytest with --update-golden to create it'.format(name))
+        return golden_file
+
+    def table(self, actual, name, rtol=1e-7, atol=1e-10):
+        """
+        Compare a table to the golden csv: numeric columns within rtol/atol (NaNs must match), other columns exactly
+        :param actual: dataframe, or csv file
+        :param name: name of the golden csv file
+        """
+        if isinstance(actual, pd.DataFrame):
+            actual_file = os.path.join(self.tmpdir, name)
+            actual.to_csv(actual_file, index=False)
+        else:
+            actual_file = actual
+        golden_file = self._golden(name, actual_file)
+        actual = pd.read_csv(actual_file)
+        expected = pd.read_csv(golden_file)
+
+        assert actual.columns.tolist() == expected.columns.tolist()
+        assert actual.shape == expected.shape
+        for col in expected.columns:
+            if pd.api.types.is_numeric_dtype(expected[col]):
+                np.testing.assert_allclose(actual[col].values.astype(float), expected[col].values.astype(float),
+                                           rtol=rtol, atol=atol, equal_nan=True, err_msg='{}: {}'.format(name, col))
+            else:
+                np.testing.assert_array_equal(actual[col].astype(str).values, expected[col].astype(str).values,
+                                              err_msg='{}: {}'.format(name, col))
+
+    def figure(self, actual_file, name, tol=2):
+        """
+        Compare a figure to the golden image: identical pixels pass immediately, otherwise the RMS pixel difference
+        must be below tol (0-255)
+        :param actual_file: image file
+        :param name: name of the golden image file
+        """
+        golden_file = self._golden(name, actual_file)
+        actual = mpimg.imread(actual_file)
+        expected = mpimg.imread(golden_file)
+        if actual.shape == expected.shape and np.array_equal(actual, expected):
+            return
+        assert actual.shape == expected.shape, '{}: image size {} != {}'.format(name, actual.shape, expected.shape)
+        result = compare_images(golden_file, actual_file, tol, in_decorator=True)
+        assert result is None, '{}: RMS pixel difference {:.3f} > {}'.format(name, result['rms'], tol)
+
+    def numbers(self, text, name, rtol=1e-6, atol=1e-10):
+        """
+        Compare the numbers in printed output (e.g. statistics tables) to the golden text, within rtol/atol
+        :param text: printed output
+        :param name: name of the golden text file
+        """
+        actual_file = os.path.join(self.tmpdir, name)
+        with open(actual_file, 'w') as f:
+            f.write(text)
+        golden_file = self._golden(name, actual_file)
+        with open(golden_file) as f:
+            expected = f.read()
+        actual_numbers = np.array(NUMBER.findall(text), dtype=float)
+        expected_numbers = np.array(NUMBER.findall(expected), dtype=float)
+        assert len(actual_numbers) == len(expected_numbers), '{}: printed output changed'.format(name)
+        np.testing.assert_allclose(actual_numbers, expected_numbers, rtol=rtol, atol=atol, err_msg=name)
+
+
+@pytest.fixture
+def golden(request, tmp_path_factory):
+    return Golden(tmp_path_factory.mktemp('golden'), request.config.getoption('--update-golden'))
+
+
+@pytest.fixture(autouse=True)
+def close_figures():
+    # start each test from the default rcParams, so the figures don't depend on which scripts were imported first
+    with matplotlib.rc_context():
+        matplotlib.rcdefaults()
+        yield
+    plt.close('all')
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+@brief Build small fixture workbooks for each project. The data are random but seeded, so the same files are built
+every time and the outputs can be compared to the golden outputs in tests/golden.
+"""
+
+import os
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+
+def _write_excel(fname, sheets):
+    with pd.ExcelWriter(fname) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    return fname
+
+
+def debay_grazing(path, expt='expt1', cruises=('Fall2019',)):
+    """
+    Chl-a and experiment times from a grazing experiment with two stations, three control bottles and four treatment
+    bottles each, for each cruise
+    """
+    rng = np.random.RandomState(1)
+    start = dt.datetime(2019, 10, 1, 8, 0)
+    chla = []
+    times = []
+    for cruise in cruises:
+        for sta in ['inside_front', 'outside_front']:
+            for btl in ['control1', 'control2', 'control3', 'treatment1', 'treatment2', 'treatment3', 'treatment4']:
+                if 'control' in btl:
+                    chla.append([cruise, sta, btl, 't0', 2.0 + rng.uniform(0, .2), np.nan, np.nan])
+                    chla.append([cruise, sta, btl, 'tf', 2.4 + rng.uniform(0, .2), np.nan, np.nan])
+                else:
+                    chla.append([cruise, sta, btl, 'tf', 1.5 + rng.uniform(0, .5), 1000.0, 20.0])
+                t0 = start + dt.timedelta(minutes=int(rng.randint(0, 60)))
+                tf = t0 + dt.timedelta(hours=24, minutes=int(rng.randint(0, 60)))
+                times.append([cruise, sta, btl, t0.strftime('%Y-%m-%dT%H:%M'), tf.strftime('%Y-%m-%dT%H:%M'),
+                              (tf - t0).total_seconds() / 3600])
+
+    chla = pd.DataFrame(chla, columns=['Cruise', 'Station', 'Bottle', 'Time Point', 'Chl (ug/l)', 'expt_vol_ml',
+                                       'num_copes'])
+    times = pd.DataFrame(times, columns=['cruise', 'station', 'bottle', 't0', 'tf', 'expt_time_hours'])
+    return _write_excel(os.path.join(path, 'DEBay_MP_{}.xlsx'.format(expt)), dict(chla=chla, expt_data=times))
+
+
+def debay_sinking(path, expt='expt2', cruises=('Fall2019',), treatments=(('algae', 10), ('algae_plastic', 14))):
+    """
+    Raw settling-column timings for fecal pellets from each treatment (station and mean time in seconds), for each
+    cruise. Two treatments by default
+    """
+    rng = np.random.RandomState(2)
+    rows = []
+    for cruise in cruises:
+        for sta, mean_time in treatments:
+            for pellet in range(20):
+                rows.append([cruise, sta, pellet, 10, mean_time * rng.uniform(0.5, 1.5)])
+    df = pd.DataFrame(rows, columns=['cruise', 'station', 'pellet_id', 'distance_cm', 'time_sec'])
+    return _write_excel(os.path.join(path, 'DEBay_MP_{}.xlsx'.format(expt)), dict(FP=df))
+
+
+def debay_field_sampling(path):
+    """
+    Flowmeter readings and tow depths for three net tows
+    """
+    df = pd.DataFrame({'tow': ['tow1', 'tow2', 'tow3'], 'flowmeter_start': [102345, 250000, 310500],
+                       'flowmeter_end': [110873, 259120, 318230], 'tow_depth_m': [5.0, 7.5, 6.0]})
+    fname = os.path.join(path, 'DEBay_MP_fieldsampling.csv')
+    df.to_csv(fname, index=False)
+    return fname
+
+
+def debay_counts(path):
+    """
+    Raw zooplankton counts and sample split fractions for the three tows in debay_field_sampling, and the tow file
+    with the volume sampled
+    """
+    rng = np.random.RandomState(3)
+    taxa = [('Copepod', 'Acartia tonsa'), ('Copepod', 'Eurytemora affinis'), ('Other', 'Barnacle nauplii')]
+    counts = pd.DataFrame([[tow, t, s, rng.randint(0, 200)] for tow in ['tow1', 'tow2', 'tow3'] for t, s in taxa],
+                          columns=['tow', 'type', 'species', 'count'])
+    splits = pd.DataFrame({'tow': ['tow1', 'tow2', 'tow3'], 'split_fraction': [0.25, 0.125, 0.5]})
+    tows = pd.DataFrame({'tow': ['tow1', 'tow2', 'tow3'], 'vol_sampled_m3': [45.2, 48.1, 40.9],
+                         'tow_depth_m': [5.0, 7.5, 6.0]})
+    tow_file = os.path.join(path, 'DEBay_MP_tows.csv')
+    tows.to_csv(tow_file, index=False)
+    fname = _write_excel(os.path.join(path, 'DEBay_MP_zooplankton_counts.xlsx'), dict(counts=counts, splits=splits))
+    return fname, tow_file
+
+
+def _station_abundance(rng, station_col, stations, taxa, big=None):
+    rows = []
+    for sta in stations:
+        for t, s in taxa:
+            value = rng.uniform(50, 1400)
+            if (sta, s) == big:
+                value = 4300.  # one very abundant species, to break the y-axis
+            rows.append([sta, t, s, value])
+    return pd.DataFrame(rows, columns=[station_col, 'type', 'species', 'abundance_count_per_m3'])
+
+
+def debay_abundance(path):
+    """
+    Zooplankton abundance at the three DE Bay stations
+    """
+    rng = np.random.RandomState(4)
+    taxa = [('Copepod', 'Acartia tonsa'), ('Copepod', 'Eurytemora affinis'), ('Copepod', 'Centropages hamatus'),
+            ('Copepod', 'Temora longicornis'), ('Other', 'Barnacle nauplii')]
+    df = _station_abundance(rng, 'station', ['outside_front', 'inside_front', 'marine'], taxa,
+                            big=('inside_front', 'Acartia tonsa'))
+    return _write_excel(os.path.join(path, 'DEBay_MP_zooplankton_abundance.xlsx'), dict(abundance=df))
+
+
+def raritan_abundance(path):
+    """
+    Zooplankton abundance at three Raritan Bay stations
+    """
+    rng = np.random.RandomState(5)
+    taxa = [('Copepod', 'Acartia tonsa'), ('Copepod', 'Acartia hudsonica'), ('Copepod', 'Pseudocalanus sp.'),
+            ('Other', 'Polychaete larvae')]
+    df = _station_abundance(rng, 'CS', ['CS1', 'CS2', 'CS3'], taxa)
+    return _write_excel(os.path.join(path, 'RaritanBay.xlsx'), dict(abundance=df))
+
+
+def rosssea_grazing(path):
+    """
+    Krill ingestion rates and lengths from four grazing experiments. Saved in a data folder, since the figures are
+    saved in the parent folder by default
+    """
+    rng = np.random.RandomState(6)
+    expts = ['Expt1', 'Expt2', 'Expt3', 'Expt4']
+    rates = pd.DataFrame({'Experiment': np.repeat(expts, 6),
+                          'Daily Individual Ingestion Rate': rng.uniform(0, 1, 24) * np.repeat([1, 1.5, 2, 1], 6),
+                          'Community Ingestion Rate': rng.uniform(1, 5, 24)})
+    lengths = pd.DataFrame({e: rng.normal(25 + 2 * i, 3, 10) for i, e in enumerate(expts)})
+    lengths.loc[8:, 'Expt2'] = np.nan  # unequal number of krill in each experiment
+    return _write_excel(os.path.join(path, 'Krill_grazing_stats.xlsx'), dict(forpython=rates, krill_length=lengths))
+
+
+def rosssea_abundance(path):
+    """
+    Zooplankton abundance (ind/m2) for five tows in two time periods
+    """
+    rng = np.random.RandomState(7)
+    species = ['E. crystallorophias adult', 'E. crystallorophias juveniles', 'T. macrura', 'Copepods', 'Amphipods',
+               'Pteropods', 'P. antarctica adult/juvenile', 'P. antarctica larvae']
+    tows = ['T1', 'T2', 'T3', 'T4', 'T5']
+    values = rng.uniform(0, 200, (len(tows), len(species))) * (rng.uniform(0, 1, (len(tows), len(species))) > 0.4)
+    abundance = pd.DataFrame(values.round(1), columns=species)
+    abundance.insert(0, 'Tow', tows)
+    key = pd.DataFrame({'Tow': tows, 'Period': ['P1', 'P1', 'P1', 'P2', 'P2'],
+                        'Comparison': ['yes', 'no', 'yes', 'yes', 'yes']})
+    return _write_excel(os.path.join(path, 'zooplankton_abundance_RossSea.xlsx'), dict(abundance=abundance, key=key))
+
+
+def rosssea_grazing_abundance(path):
+    """
+    Zooplankton abundance and percent abundance for the tows from the grazing cruise. Saved in a data folder, since
+    the figures are saved in the parent folder by default
+    """
+    rng = np.random.RandomState(8)
+    species = ['E. crystallorophias adult', 'T. macrura', 'Amphipods', 'Pteropods', 'P. antarctica adult/juvenile',
+               'P. antarctica larvae', 'Other rare']
+    tows = ['G1', 'G2', 'G3']
+    values = rng.uniform(0, 1, (len(tows), len(species)))
+    percent = pd.DataFrame(100 * values / values.sum(axis=1, keepdims=True), columns=species)
+    percent.insert(0, 'Tow', tows)
+    total = pd.DataFrame({'Tow': tows, 'Total': rng.uniform(500, 3000, len(tows))})
+    return _write_excel(os.path.join(path, 'zooplankton_abundance_grazing.xlsx'),
+                        dict(percent_abundance=percent, abundance_ind_m2=total))
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+"""
+@brief Golden-output tests for the DE Bay microplastics scripts
+"""
+
+import os
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+from tests import fixtures
+from DE_Bay_microplastics import calculate_abundance, calculate_expt_time, FP_sinking_rates, ingestion_rates, \
+    water_volume_sampled, zooplankton_abundance
+from functions import abundance, cli
+from functions.grazing import _Histogram, ingestion_rate_uncertainty
+from functions.schema import load_sheet
+from functions.sinking import calculate_sinking_rates, compare_treatments
+from functions.validation import check, validate_grazing
+
+CRUISES = ('Fall2019', 'Spring2020')
+
+
+@pytest.fixture(scope='module')
+def data(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('debay'))
+    counts, tows = fixtures.debay_counts(path)
+    return dict(grazing=fixtures.debay_grazing(path),
+                field_sampling=fixtures.debay_field_sampling(path), counts=counts, tows=tows,
+                abundance=fixtures.debay_abundance(path))
+
+
+def test_expt_time(data, golden, tmp_path):
+    csv_file = str(tmp_path / 'expt_time.csv')
+    calculate_expt_time.main(data['grazing'], csv_file)
+    golden.table(csv_file, 'debay_expt_time.csv')
+
+
+def test_water_volume(data, golden, tmp_path):
+    water_volume_sampled.main(data['field_sampling'], 26873, 0.25, outdir=str(tmp_path))
+    golden.table(str(tmp_path / 'DEBay_MP_fieldsampling.csv'), 'debay_water_volume.csv')
+
+
+def test_abundance(data, golden, tmp_path):
+    calculate_abundance.main(data['counts'], data['tows'], outdir=str(tmp_path))
+    golden.table(str(tmp_path / 'DEBay_MP_zooplankton_counts_abundance_calculated.csv'), 'debay_abundance.csv')
+
+
+def test_abundance_split_keys():
+    counts = pd.DataFrame({'tow': ['tow1', 'tow1', 'tow2'], 'aliquot': [1, 2, 1], 'species': ['a', 'a', 'b'],
+                           'count': [10, 20, 5], 'notes': ['', 'recount', '']})
+    tows = pd.DataFrame({'tow': ['tow1', 'tow2'], 'vol_sampled_m3': [10., 20.]})
+
+    # columns shared with the counts (notes) aren't used to join the split fractions
+    splits = pd.DataFrame({'tow': ['tow1', 'tow2'], 'split_fraction': [0.5, 0.25], 'notes': ['', '']})
+    df = abundance.calculate_abundance(counts, splits, tows)
+    np.testing.assert_allclose(df['abundance_count_per_m3'], [6, 1])
+
+    # a different split for each aliquot
+    splits = pd.DataFrame({'tow': ['tow1', 'tow1', 'tow2'], 'aliquot': [1, 2, 1], 'split_fraction': [0.5, 0.25, 0.5]})
+    df = abundance.calculate_abundance(counts, splits, tows, split_keys=['tow', 'aliquot'])
+    np.testing.assert_allclose(df['abundance_count_per_m3'], [10, 0.5])
+
+
+def test_abundance_cruises(tmp_path):
+    # tow IDs are reused between cruises, so the tows are identified by cruise and tow
+    counts = pd.DataFrame({'cruise': ['Spring2019', 'Spring2019', 'Fall2019'], 'tow': ['tow1', 'tow2', 'tow1'],
+                           'species': ['a', 'a', 'a'], 'count': [10, 20, 30]})
+    splits = pd.DataFrame({'cruise': ['Spring2019', 'Spring2019', 'Fall2019'], 'tow': ['tow1', 'tow2', 'tow1'],
+                           'split_fraction': [0.5, 0.25, 1.]})
+    tows = pd.DataFrame({'cruise': ['Spring2019', 'Spring2019', 'Fall2019'], 'tow': ['tow1', 'tow2', 'tow1'],
+                         'vol_sampled_m3': [10., 20., 30.]})
+    f = fixtures._write_excel(str(tmp_path / 'counts.xlsx'), dict(counts=counts, splits=splits))
+    tow_file = str(tmp_path / 'tows.csv')
+    tows.to_csv(tow_file, index=False)
+
+    calculate_abundance.main(f, tow_file)
+    df = pd.read_csv(str(tmp_path / 'counts_abundance_calculated.csv'))
+    np.testing.assert_array_equal(df['cruise'], counts['cruise'])
+    np.testing.assert_allclose(df['abundance_count_per_m3'], [2, 4, 1])
+
+    outdir = tmp_path / 'cli'
+    outdir.mkdir()
+    assert cli.main(['abundance', f, '--tows', tow_file, '--outdir', str(outdir), '--keys', 'cruise', 'tow']) == 0
+    pd.testing.assert_frame_equal(pd.read_csv(str(outdir / 'counts_abundance_calculated.csv')), df)
+
+    # with only the tow as the key, the split fractions aren't unique
+    with pytest.raises(pd.errors.MergeError):
+        calculate_abundance.main(f, tow_file, keys=['tow'])
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_ingestion_rates(golden, tmp_path, n_jobs):
+    # two cruises, so n_jobs > 1 runs the cruises in worker processes
+    f = fixtures.debay_grazing(str(tmp_path), cruises=CRUISES)
+    outdir = tmp_path / 'output'
+    outdir.mkdir()
+    ingestion_rates.main(f, 'expt1', n_jobs=n_jobs, outdir=str(outdir))
+    for table in ['rates', 'stats']:
+        fname = 'DEBay_MP_expt1_chla_ingest_rates_summary_{}.csv'.format(table)
+        golden.table(str(outdir / fname), 'debay_ingestion_{}.csv'.format(table))
+    for cruise in CRUISES:
+        golden.figure(str(outdir / 'Chla_ingest_rates_expt1_{}.png'.format(cruise)),
+                      'debay_ingestion_rates_{}.png'.format(cruise))
+
+
+@pytest.mark.parametrize('out_fmt', ['xlsx', 'parquet'])
+def test_ingestion_rates_formats(data, tmp_path, out_fmt):
+    # the summary tables in each format match the csv tables
+    for fmt in ['csv', out_fmt]:
+        (tmp_path / fmt).mkdir()
+        ingestion_rates.main(data['grazing'], 'expt1', out_fmt=fmt, outdir=str(tmp_path / fmt))
+    fname = 'DEBay_MP_expt1_chla_ingest_rates_summary'
+    for table in ['rates', 'stats']:
+        expected = pd.read_csv(str(tmp_path / 'csv' / '{}_{}.csv'.format(fname, table)))
+        if out_fmt == 'xlsx':
+            actual = pd.read_excel(str(tmp_path / 'xlsx' / '{}.xlsx'.format(fname)), sheet_name=table)
+        else:
+            actual = pd.read_parquet(str(tmp_path / 'parquet' / '{}_{}.parquet'.format(fname, table)))
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_ingestion_rate_uncertainty(data, golden):
+    chla = load_sheet(data['grazing'], 'chla')
+    expt_data = load_sheet(data['grazing'], 'expt_data')
+    rates_ci, stats_ci = ingestion_rate_uncertainty(chla, expt_data, n_reps=200, seed=0)
+    golden.table(rates_ci, 'debay_ingestion_rates_ci.csv')
+    golden.table(stats_ci, 'debay_ingestion_stats_ci.csv')
+
+    # replicates processed in chunks of 10 give the same estimates and similar confidence intervals
+    chunked = ingestion_rate_uncertainty(chla, expt_data, n_reps=2000, max_elements=100, seed=0)
+    full = ingestion_rate_uncertainty(chla, expt_data, n_reps=2000, seed=0)
+    for c, f in zip(chunked, full):
+        assert c.shape == f.shape
+        np.testing.assert_allclose(c.filter(like='ingestion_rate'), f.filter(like='ingestion_rate'))
+        np.testing.assert_allclose(c[['mc_mean', 'ci_lower', 'ci_upper']], f[['mc_mean', 'ci_lower', 'ci_upper']],
+                                   rtol=0.1)
+
+
+def test_streaming_percentiles():
+    # percentiles from the streaming histograms match the exact percentiles to within about the bin width, also when
+    # later chunks extend the range (the second and third chunks are shifted up and down)
+    rng = np.random.RandomState(0)
+    chunks = [rng.normal(0, 1, (5000, 3)), rng.normal(5, 2, (5000, 3)), rng.normal(-20, 1, (100, 3))]
+    chunks[0][::7, 1] = np.nan
+    chunks[1][:, 2] = np.nan
+    hist = _Histogram(3, n_bins=4096)
+    for chunk in chunks:
+        hist.update(chunk)
+    values = np.vstack(chunks)
+    q = [2.5, 50, 97.5]
+    np.testing.assert_allclose(hist.percentile(q), np.nanpercentile(values, q, axis=0), atol=0.05)
+    np.testing.assert_allclose(hist.mean(), np.nanmean(values, axis=0))
+
+
+def test_ingestion_rate_uncertainty_memory(data):
+    # memory is bounded by max_elements, not by the number of replicates
+    chla = load_sheet(data['grazing'], 'chla')
+    expt_data = load_sheet(data['grazing'], 'expt_data')
+    peaks = []
+    for n_reps in [10000, 100000]:
+        tracemalloc.start()
+        ingestion_rate_uncertainty(chla, expt_data, n_reps=n_reps, max_elements=1e4, seed=0)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    assert peaks[1] < 2e6
+    assert peaks[1] < 1.5 * peaks[0]
+
+
+def test_validation(data):
+    chla = load_sheet(data['grazing'], 'chla')
+    expt_data = load_sheet(data['grazing'], 'expt_data')
+    assert len(validate_grazing(chla, expt_data)) == 0
+
+    chla.loc[0, 'chl_ug_l'] = -1
+    chla.loc[chla['bottle'] == 'treatment2', 'num_copes'] = 0
+    expt_data = expt_data[expt_data['bottle'] != 'control3']
+    issues = validate_grazing(chla, pd.concat([expt_data, expt_data.iloc[[0]]]))
+    errors = issues[issues['level'] == 'error']
+    assert set(errors['check']) == {'nonpositive_chl', 'zero_count', 'duplicate_bottle'}
+    assert np.sum(errors['check'] == 'zero_count') == 2  # one bottle at each station
+    assert set(issues[issues['level'] == 'warning']['check']) == {'missing_time'}
+
+    with pytest.raises(ValueError):
+        check(issues, data['grazing'])
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_sinking_rates(golden, tmp_path, n_jobs):
+    f = fixtures.debay_sinking(str(tmp_path), cruises=CRUISES)
+    outdir = tmp_path / 'output'
+    outdir.mkdir()
+    FP_sinking_rates.main(f, 'expt2', n_jobs=n_jobs, outdir=str(outdir))
+    for cruise in CRUISES:
+        golden.figure(str(outdir / 'FP_sinking_rates_expt2_{}.png'.format(cruise)),
+                      'debay_sinking_rates_{}.png'.format(cruise))
+
+
+def test_calculate_sinking_rates():
+    # pellet 1 is timed over two intervals, pellet 2 has no valid time
+    df = pd.DataFrame({'cruise': 'Fall2019', 'station': 'algae', 'pellet_id': [1, 1, 2], 'distance_cm': [10, 10, 10],
+                       'time_sec': [10, 30, 0]})
+    rates = calculate_sinking_rates(df)
+    np.testing.assert_allclose(rates['sinking_rate_m_day'], [0.2 / 40 * 86400, np.nan])
+
+
+def test_compare_treatments():
+    df = pd.DataFrame({'station': np.repeat(['a', 'b', 'c'], 4),
+                       'sinking_rate_m_day': [1., 2, 3, 2, 2, 3, 4, 3, 8, 9, 10, 9]})
+    result = compare_treatments(df, 'station')
+    assert result['test'] == 'ANOVA'
+
+    # one-way ANOVA: between-group mean square over the within-group mean square
+    groups = df.groupby('station')['sinking_rate_m_day']
+    grand_mean = df['sinking_rate_m_day'].mean()
+    ms_between = (groups.size() * (groups.mean() - grand_mean) ** 2).sum() / 2
+    ms_within = ((df['sinking_rate_m_day'] - groups.transform('mean')) ** 2).sum() / 9
+    np.testing.assert_allclose(result['statistic'], ms_between / ms_within)
+    assert result['pvalue'] < 0.001
+
+    # only c differs from the other treatments
+    tukey = result['tukey']
+    np.testing.assert_allclose(tukey.meandiffs, [1, 7, 6])
+    np.testing.assert_array_equal(tukey.reject, [False, True, True])
+
+
+def test_sinking_rates_treatments(tmp_path, monkeypatch, capsys):
+    # three treatments: one box color per treatment and an ANOVA with Tukey HSD pairwise comparison
+    figs = []
+    monkeypatch.setattr(FP_sinking_rates, 'save_figure', lambda fig, fname: figs.append(fig))
+    treatments = [('algae', 10), ('algae_plastic', 14), ('plastic', 30)]
+    f = fixtures.debay_sinking(str(tmp_path), cruises=CRUISES, treatments=treatments)
+    FP_sinking_rates.main(f, 'expt2', outdir=str(tmp_path))
+
+    assert len(figs) == len(CRUISES)
+    colors = [tuple(patch.get_facecolor()) for patch in figs[0].axes[0].patches]
+    assert len(colors) == len(treatments) and len(set(colors)) == len(treatments)
+    out = capsys.readouterr().out
+    for cruise in CRUISES:
+        assert 'Cruise: {}, Treatment: plastic'.format(cruise) in out
+        assert 'Tukey HSD pairwise-comparison: {}'.format(cruise) in out
+
+
+def test_zooplankton_abundance(data, golden, tmp_path):
+    zooplankton_abundance.main(data['abundance'], outdir=str(tmp_path))
+    figs = ['zooplankton_abundance', 'zooplankton_abundance_brokenaxis', 'zooplankton_abundance1',
+            'zooplankton_abundance2', 'zooplankton_abundance3', 'zooplankton_abundance_atonsa']
+    for fig in figs:
+        golden.figure(str(tmp_path / '{}.png'.format(fig)), 'debay_{}.png'.format(fig))
+    assert sorted(os.listdir(str(tmp_path))) == sorted(['{}.png'.format(fig) for fig in figs])
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+@brief Tests for the report mode: figures composed into a multi-page pdf or a tiled image
+"""
+
+import os
+import re
+import threading
+import time
+import numpy as np
+import pytest
+import matplotlib.image as mpimg
+import matplotlib.pyplot as plt
+from tests import fixtures
+from functions import cli
+from functions import figure_writer
+from functions.figure_writer import FigureWriter, ReportWriter, tile_images
+from Ross_Sea_2018 import krill_length, plot_ingestion_rates
+
+
+def _pdf_pages(fname):
+    with open(fname, 'rb') as f:
+        return len(re.findall(rb'/Type\s*/Page[^s]', f.read()))
+
+
+def _figures(n):
+    # figures of two sizes, numbered in the title
+    figs = []
+    for i in range(n):
+        fig, ax = plt.subplots(figsize=(2, 1.5) if i % 2 else (3, 2))
+        ax.set_title(str(i))
+        figs.append(fig)
+    return figs
+
+
+def test_figure_writer_pixels(tmp_path):
+    # figures written in the background are identical to savefig
+    for i, fig in enumerate(_figures(2)):
+        fig.savefig(str(tmp_path / 'savefig{}.png'.format(i)), dpi=100)
+    with FigureWriter(dpi=100) as writer:
+        for i, fig in enumerate(_figures(2)):
+            writer.save(fig, str(tmp_path / 'writer{}.png'.format(i)))
+    for i in range(2):
+        expected = mpimg.imread(str(tmp_path / 'savefig{}.png'.format(i)))
+        np.testing.assert_array_equal(mpimg.imread(str(tmp_path / 'writer{}.png'.format(i))), expected)
+
+
+def test_figure_writer_backpressure(tmp_path, monkeypatch):
+    # the first figure can't be written until release is set, so saving the second waits for it (queue over the limit)
+    release = threading.Event()
+    imsave = figure_writer._imsave
+
+    def slow_imsave(*args):
+        release.wait(10)
+        imsave(*args)
+
+    monkeypatch.setattr(figure_writer, '_imsave', slow_imsave)
+    writer = FigureWriter(max_workers=1, max_queued_mb=0.01)
+    fig1, fig2 = _figures(2)
+    writer.save(fig1, str(tmp_path / 'fig1.png'))
+    second = threading.Thread(target=writer.save, args=(fig2, str(tmp_path / 'fig2.png')))
+    second.start()
+    time.sleep(0.5)
+    assert second.is_alive()
+    release.set()
+    second.join(10)
+    assert not second.is_alive()
+    writer.close()
+    assert sorted(os.listdir(str(tmp_path))) == ['fig1.png', 'fig2.png']
+
+
+def test_figure_writer_errors(tmp_path, monkeypatch):
+    def failing_imsave(*args):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(figure_writer, '_imsave', failing_imsave)
+    writer = FigureWriter()
+    writer.save(_figures(1)[0], str(tmp_path / 'fig.png'))
+    with pytest.raises(OSError, match='disk full'):
+        writer.flush()
+    writer.close()  # errors are only raised once
+
+
+@pytest.fixture(scope='module')
+def grazing(tmp_path_factory):
+    return fixtures.rosssea_grazing(str(tmp_path_factory.mktemp('rosssea')))
+
+
+def test_tile_images():
+    images = [np.zeros((10, 20, 4), dtype=np.uint8), np.zeros((15, 5, 4), dtype=np.uint8),
+              np.zeros((5, 5, 4), dtype=np.uint8)]
+    tiled = tile_images(images, 2)
+    assert tiled.shape == (30, 40, 4)
+    assert np.all(tiled[:10, :20] == 0) and np.all(tiled[10:15, :20] == 255)  # padded to the largest image
+    assert np.all(tiled[:15, 20:25] == 0) and np.all(tiled[:, 25:] == 255)
+    assert np.all(tiled[15:20, :5] == 0)
+    assert tile_images(images, 5).shape == (15, 60, 4)
+
+
+def test_report_paging(tmp_path):
+    with ReportWriter(str(tmp_path / 'report.pdf')) as writer:
+        for fig in _figures(5):
+            writer.save(fig)
+    assert _pdf_pages(str(tmp_path / 'report.pdf')) == 5
+
+    with ReportWriter(str(tmp_path / 'tiled.pdf'), ncols=2, nrows=1) as writer:
+        for fig in _figures(5):
+            writer.save(fig)
+    assert _pdf_pages(str(tmp_path / 'tiled.pdf')) == 3
+
+    writer = ReportWriter(str(tmp_path / 'report.png'), ncols=2, nrows=1, dpi=100)
+    with writer:
+        for fig in _figures(5):
+            writer.save(fig)
+    assert [os.path.basename(f) for f in writer.files] == ['report_1.png', 'report_2.png', 'report_3.png']
+    assert [mpimg.imread(f).shape[:2] for f in writer.files] == [(200, 600), (200, 600), (200, 300)]
+    assert not os.path.exists(str(tmp_path / 'report.png'))
+
+
+def test_pdf_report(grazing, tmp_path):
+    # with a report, all figures are composed in this process even if n_jobs > 1
+    plot_ingestion_rates.main(grazing, n_jobs=2, outdir=str(tmp_path), report='pdf')
+    assert os.listdir(str(tmp_path)) == ['Krill_grazing_stats_report.pdf']
+    assert _pdf_pages(str(tmp_path / 'Krill_grazing_stats_report.pdf')) == 12
+
+
+def test_png_report(grazing, tmp_path):
+    figdir = tmp_path / 'figures'
+    figdir.mkdir()
+    krill_length.main(grazing, outdir=str(figdir))
+    figures = [mpimg.imread(str(figdir / f)) for f in sorted(os.listdir(str(figdir)))]
+
+    report_dir = tmp_path / 'report'
+    report_dir.mkdir()
+    krill_length.main(grazing, outdir=str(report_dir), report='png')
+    assert os.listdir(str(report_dir)) == ['Krill_grazing_stats_report.png']
+    tiled = mpimg.imread(str(report_dir / 'Krill_grazing_stats_report.png'))
+
+    # 5 figures, 3 per row, each panel is one of the figures written to its own file
+    h = max([fig.shape[0] for fig in figures])
+    w = max([fig.shape[1] for fig in figures])
+    assert tiled.shape == (2 * h, 3 * w, 4)
+    for i in range(len(figures)):
+        row, col = divmod(i, 3)
+        panel = tiled[row * h:(row + 1) * h, col * w:(col + 1) * w]
+        assert any([np.array_equal(panel[:fig.shape[0], :fig.shape[1]], fig) for fig in figures])
+
+
+def test_cli_report(grazing, tmp_path):
+    assert cli.main(['krill-length', grazing, '--outdir', str(tmp_path), '--report', 'pdf']) == 0
+    assert os.listdir(str(tmp_path)) == ['Krill_grazing_stats_report.pdf']
+    assert _pdf_pages(str(tmp_path / 'Krill_grazing_stats_report.pdf')) == 5
+
+
+@pytest.mark.parametrize('report, ncols, nrows, expected', [
+    ('pdf', 2, 1, ['Krill_grazing_stats_report.pdf']),
+    ('png', 2, 2, ['Krill_grazing_stats_report_1.png', 'Krill_grazing_stats_report_2.png'])
+])
+def test_cli_report_layout(grazing, tmp_path, report, ncols, nrows, expected):
+    assert cli.main(['krill-length', grazing, '--outdir', str(tmp_path), '--report', report, '--ncols', str(ncols),
+                     '--nrows', str(nrows)]) == 0
+    assert sorted(os.listdir(str(tmp_path))) == expected
+    if report == 'pdf':
+        # 5 figures, 2 per page, composed as raster images
+        fname = str(tmp_path / expected[0])
+        assert _pdf_pages(fname) == 3
+        with open(fname, 'rb') as f:
+            assert len(re.findall(rb'/Subtype\s*/Image', f.read())) == 3
+    else:
+        # two rows of panels on the first image, the last figure on the second (all figures are the same size)
+        shapes = [mpimg.imread(str(tmp_path / f)).shape for f in expected]
+        assert shapes[0][:2] == (2 * shapes[1][0], 2 * shapes[1][1])
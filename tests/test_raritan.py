@@ -0,0 +1,16 @@
+#!/usr/bin/env python
+"""
+@brief Golden-output tests for the Raritan Bay 2019 scripts
+"""
+
+from tests import fixtures
+from RaritanBay2019 import RB_zooplankton_abundance
+
+
+def test_zooplankton_abundance(golden, tmp_path):
+    f = fixtures.raritan_abundance(str(tmp_path))
+    figdir = tmp_path / 'figures'
+    figdir.mkdir()
+    RB_zooplankton_abundance.main(f, outdir=str(figdir))
+    for fig in ['zooplankton_abundance1', 'zooplankton_abundance2', 'zooplankton_abundance_atonsa']:
+        golden.figure(str(figdir / '{}.png'.format(fig)), 'raritan_{}.png'.format(fig))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+@brief Golden-output tests for the Ross Sea 2018 scripts
+"""
+
+import importlib
+import os
+import pandas as pd
+import pytest
+from tests import fixtures
+from Ross_Sea_2018 import krill_length, plot_ingestion_rates, zooplankton_abundance_RossSea, \
+    zooplankton_abundance_RossSea_grazing
+
+
+@pytest.fixture(scope='module')
+def data(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('rosssea'))
+    return dict(grazing=fixtures.rosssea_grazing(path), abundance=fixtures.rosssea_abundance(path),
+                grazing_abundance=fixtures.rosssea_grazing_abundance(path))
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+def test_ingestion_plots(data, golden, tmp_path, capsys, n_jobs):
+    plot_ingestion_rates.main(data['grazing'], n_jobs=n_jobs, outdir=str(tmp_path))
+    golden.numbers(capsys.readouterr().out, 'rosssea_ingestion_stats.txt')
+    for fname in sorted(os.listdir(str(tmp_path))):
+        golden.figure(str(tmp_path / fname), 'rosssea_{}'.format(fname))
+    assert len(os.listdir(str(tmp_path))) == 12
+
+
+def test_krill_length(data, golden, tmp_path, capsys):
+    krill_length.main(data['grazing'], outdir=str(tmp_path))
+    golden.numbers(capsys.readouterr().out, 'rosssea_krill_length_stats.txt')
+    for fname in sorted(os.listdir(str(tmp_path))):
+        golden.figure(str(tmp_path / fname), 'rosssea_{}'.format(fname))
+    assert len(os.listdir(str(tmp_path))) == 5
+
+
+def test_zooplankton_abundance(data, golden, tmp_path):
+    importlib.reload(zooplankton_abundance_RossSea)  # applies the rcParams the script sets on import
+    zooplankton_abundance_RossSea.main(data['abundance'], outdir=str(tmp_path))
+    golden.table(str(tmp_path / 'zoop_diversity_indices.csv'), 'rosssea_diversity_indices.csv')
+    golden.table(str(tmp_path / 'zoop_braycurtis_dissimilarity.csv'), 'rosssea_braycurtis_dissimilarity.csv')
+    for period in ['P1', 'P2']:
+        for fname in ['{}_zoop_abundance.png', '{}_zoop_abundance_biomasscompare.png']:
+            fname = fname.format(period)
+            golden.figure(str(tmp_path / fname), 'rosssea_{}'.format(fname))
+
+
+def test_zooplankton_abundance_key_order(tmp_path, monkeypatch, capsys):
+    # tows are plotted in the order of the key sheet, tows without abundance data are skipped
+    f = fixtures.rosssea_abundance(str(tmp_path))
+    sheets = pd.read_excel(f, sheet_name=None)
+    key = sheets['key'].iloc[[2, 0, 1, 3, 4]]
+    sheets['key'] = pd.concat([key, pd.DataFrame({'Tow': ['T6'], 'Period': ['P1'], 'Comparison': ['yes']})])
+    fixtures._write_excel(f, sheets)
+
+    tows = dict()
+    monkeypatch.setattr(zooplankton_abundance_RossSea, 'stacked_bar_chart',
+                        lambda df, group_list, column_name, sname, *args: tows.setdefault(sname, pd.unique(df['Tow'])))
+    zooplankton_abundance_RossSea.main(f, outdir=str(tmp_path))
+    assert tows['P1_zoop_abundance.png'].tolist() == ['T3', 'T1', 'T2']
+    assert tows['P2_zoop_abundance.png'].tolist() == ['T4', 'T5']
+    assert "no abundance data for tows ['T6']" in capsys.readouterr().out
+
+
+def test_zooplankton_abundance_grazing(data, golden, tmp_path):
+    importlib.reload(zooplankton_abundance_RossSea_grazing)  # applies the rcParams the script sets on import
+    zooplankton_abundance_RossSea_grazing.main(data['grazing_abundance'], outdir=str(tmp_path))
+    for fname in ['zoop_abundance_total.png', 'zoop_percent_abundance.png']:
+        golden.figure(str(tmp_path / fname), 'rosssea_grazing_{}'.format(fname))
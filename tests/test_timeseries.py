@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+@brief Tests for the time series statistics: statistics combined from the history must match the statistics calculated
+from all of the raw values
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from tests import fixtures
+from DE_Bay_microplastics import ingestion_rates
+from functions import cli
+from functions.timeseries import append_history, cruise_date, cruise_summary, load_history, resample_stats, \
+    rolling_stats, sufficient_stats
+
+
+@pytest.fixture
+def cruises():
+    rng = np.random.RandomState(0)
+    data = []
+    for year in [2018, 2019, 2020]:
+        for season in ['Spring', 'Fall']:
+            n = rng.randint(3, 8)
+            data.append(pd.DataFrame({'cruise': '{}{}'.format(season, year), 'station': rng.choice(['a', 'b'], n),
+                                      'value': rng.lognormal(0, 0.5, n)}))
+    return data
+
+
+def _history(path, cruises):
+    for df in cruises:
+        append_history(path, sufficient_stats(df, 'rate', 'value', df['cruise'].iloc[0], station_col='station'))
+    return load_history(path)
+
+
+def test_cruise_date():
+    assert cruise_date('Fall2019') == pd.Timestamp(2019, 10, 15)
+    assert cruise_date('Spring 2020') == pd.Timestamp(2020, 4, 15)
+    assert cruise_date('2018-01-05') == pd.Timestamp(2018, 1, 5)
+    with pytest.raises(ValueError):
+        cruise_date('RS18')
+
+
+def test_incremental(cruises, tmp_path):
+    stats = _history(str(tmp_path), cruises)
+    raw = pd.concat(cruises, ignore_index=True)
+    raw['date'] = [cruise_date(c) for c in raw['cruise']]
+
+    summary = cruise_summary(stats).set_index(['station', 'cruise'])
+    expected = raw.groupby(['station', 'cruise'])['value'].agg(['mean', 'std', 'size'])
+    np.testing.assert_allclose(summary.loc[expected.index, 'mean'], expected['mean'])
+    np.testing.assert_allclose(summary.loc[expected.index, 'stdev'], expected['std'])
+    np.testing.assert_array_equal(summary.loc[expected.index, 'n'], expected['size'])
+
+    annual = resample_stats(stats, 'Y').set_index(['station', 'period'])
+    expected = raw.groupby(['station', raw['date'].dt.year.astype(str)])['value'].agg(['mean', 'std'])
+    np.testing.assert_allclose(annual.loc[expected.index, 'mean'], expected['mean'])
+    np.testing.assert_allclose(annual.loc[expected.index, 'stdev'], expected['std'])
+
+    rolling = rolling_stats(stats, window=3)
+    for i, row in rolling.iterrows():
+        sta = raw[raw['station'] == row['station']]
+        dates = np.sort(sta['date'].unique())
+        recent = dates[max(0, np.searchsorted(dates, row['date']) - 2):np.searchsorted(dates, row['date']) + 1]
+        values = sta.loc[sta['date'].isin(recent), 'value']
+        assert row['n_cruises'] == len(recent)
+        np.testing.assert_allclose([row['mean'], row['n']], [values.mean(), len(values)])
+        if len(values) > 1:
+            np.testing.assert_allclose(row['stdev'], values.std())
+
+    # processing a cruise again replaces its statistics
+    append_history(str(tmp_path), sufficient_stats(cruises[0].iloc[:2], 'rate', 'value', 'Spring2018',
+                                                   station_col='station'))
+    assert load_history(str(tmp_path))['n'].sum() == len(raw) - len(cruises[0]) + 2
+
+
+def test_ingestion_history(tmp_path):
+    f = fixtures.debay_grazing(str(tmp_path))
+    history = str(tmp_path / 'history')
+    ingestion_rates.main(f, 'expt1', outdir=str(tmp_path), history=history)
+    summary = cruise_summary(load_history(history))
+    expected = pd.read_csv(str(tmp_path / 'DEBay_MP_expt1_chla_ingest_rates_summary_stats.csv'))
+    np.testing.assert_array_equal(summary['station'], sorted(expected['treatment']))
+    expected = expected.set_index('treatment').loc[summary['station']]
+    np.testing.assert_allclose(summary['mean'], expected['ingestion_rate_avg (ug Chl/ind/day)'])
+    np.testing.assert_allclose(summary['stdev'], expected['ingestion_rate_stdev (ug Chl/ind/day)'])
+
+
+def test_cli(cruises, tmp_path):
+    files = []
+    for df in cruises:
+        fname = str(tmp_path / '{}.csv'.format(df['cruise'].iloc[0]))
+        df.drop(columns='cruise').to_csv(fname, index=False)
+        files.append(fname)
+    history = str(tmp_path / 'history')
+    for f in files:
+        cruise = os.path.splitext(os.path.basename(f))[0]
+        assert cli.main(['timeseries', f, '--history', history, '--value-col', 'value', '--cruise', cruise]) == 0
+    # no inputs, only writes the statistics (also with several jobs, e.g. from a config file)
+    assert cli.main(['timeseries', '--history', history, '--freq', 'season', '--window', '2', '-j', '2']) == 0
+
+    stats = _history(str(tmp_path / 'expected'), cruises)
+    expected = rolling_stats(stats, window=2)
+    actual = pd.read_csv(os.path.join(history, 'timeseries_rolling2.csv'))
+    np.testing.assert_allclose(actual['mean'], expected['mean'])
+    actual = pd.read_csv(os.path.join(history, 'timeseries_season.csv'))
+    np.testing.assert_allclose(actual['mean'], resample_stats(stats, 'season')['mean'])